@@ -1,3 +1,5 @@
+from functools import cached_property
+
 from pydantic_settings import BaseSettings, SettingsConfigDict
 from pydantic import Field
 from typing import List, Union, Optional
@@ -37,7 +39,7 @@ class Settings(BaseSettings):
         extra="ignore",
     )
 
-    @property
+    @cached_property
     def cors_origins_list(self) -> List[str]:
         if isinstance(self.CORS_ORIGINS, list):
             return self.CORS_ORIGINS
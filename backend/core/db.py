@@ -1,5 +1,9 @@
 # core/db.py
+from functools import lru_cache
+
 from motor.motor_asyncio import AsyncIOMotorClient
+from pymongo import ReadPreference
+
 from core.config import settings
 
 client: AsyncIOMotorClient | None = None
@@ -13,12 +17,18 @@ async def connect_db():
         settings.MONGO_URI,
         uuidRepresentation="standard",
         serverSelectionTimeoutMS=5000,
+        maxPoolSize=200,
+        minPoolSize=10,
+        compressors="zstd,snappy,zlib",
+        retryReads=True,
+        appname="obvioustrades-api",
     )
 
 
     await client.admin.command("ping")
 
     db = client[settings.MONGO_DB]
+    get_collection.cache_clear()
 
     print("✅ MongoDB connected")
 
@@ -33,4 +43,22 @@ async def close_db():
 def get_db():
     if db is None:
         raise RuntimeError("Database not initialized")
-    return db
\ No newline at end of file
+    return db
+
+
+@lru_cache(maxsize=None)
+def get_collection(name: str):
+    """Cached collection handle (cleared when connect_db re-creates the client)."""
+    return get_db()[name]
+
+
+def get_db_read():
+    """Read-only handle for polling endpoints.
+
+    secondaryPreferred offloads reads to a secondary when a replica set is
+    configured and behaves exactly like get_db() on a standalone server.
+    """
+    return get_db().client.get_database(
+        settings.MONGO_DB,
+        read_preference=ReadPreference.SECONDARY_PREFERRED,
+    )
\ No newline at end of file
@@ -1,12 +1,17 @@
 # core/security.py
 from __future__ import annotations
 
+import threading
 from datetime import datetime, timedelta, timezone
 from typing import Any, Dict, Optional, Tuple
 from uuid import uuid4
 
+import anyio.to_thread
 import bcrypt
 import jwt
+from argon2 import PasswordHasher
+from argon2.exceptions import Argon2Error, InvalidHashError
+from cachetools import TTLCache
 from fastapi import HTTPException, Request, Response, status
 
 from core.config import settings
@@ -18,26 +23,55 @@ _BCRYPT_ROUNDS = int(getattr(settings, "BCRYPT_ROUNDS", 12))
 MIN_PASSWORD_LEN = int(getattr(settings, "MIN_PASSWORD_LEN", 5))
 
 
+# argon2id exploits SIMD + threads, so it is substantially cheaper than
+# bcrypt at rounds=12 for an equivalent security margin. Existing bcrypt
+# hashes keep verifying; password_needs_rehash lets login migrate them.
+_ph = PasswordHasher(time_cost=2, memory_cost=64 * 1024, parallelism=2)
+
+
 def hash_password(password: str) -> str:
     if not password or len(password) < MIN_PASSWORD_LEN:
         raise HTTPException(
             status_code=400,
             detail=f"Password must be at least {MIN_PASSWORD_LEN} characters.",
         )
-    salt = bcrypt.gensalt(rounds=_BCRYPT_ROUNDS)
-    hashed = bcrypt.hashpw(password.encode("utf-8"), salt)
-    return hashed.decode("utf-8")
+    return _ph.hash(password)
 
 
 def verify_password(password: str, password_hash: str) -> bool:
     if not password or not password_hash:
         return False
+    if password_hash.startswith("$argon2"):
+        try:
+            return _ph.verify(password_hash, password)
+        except (Argon2Error, InvalidHashError):
+            return False
+    # legacy bcrypt hashes from before the argon2 switch
     try:
         return bcrypt.checkpw(password.encode("utf-8"), password_hash.encode("utf-8"))
     except Exception:
         return False
 
 
+async def hash_password_async(password: str) -> str:
+    """Hash on a worker thread so the event loop keeps serving requests."""
+    return await anyio.to_thread.run_sync(hash_password, password)
+
+
+async def verify_password_async(password: str, password_hash: str) -> bool:
+    """Verify on a worker thread so the event loop keeps serving requests."""
+    return await anyio.to_thread.run_sync(verify_password, password, password_hash)
+
+
+def password_needs_rehash(password_hash: str) -> bool:
+    if not password_hash.startswith("$argon2"):
+        return True
+    try:
+        return _ph.check_needs_rehash(password_hash)
+    except InvalidHashError:
+        return True
+
+
 def _get_required_str(name: str, default: Optional[str] = None) -> str:
     v = getattr(settings, name, None)
     if isinstance(v, str) and v.strip():
@@ -56,6 +90,11 @@ REFRESH_TTL_DAYS = int(getattr(settings, "REFRESH_TOKEN_TTL_DAYS", 14))
 ACCESS_COOKIE = getattr(settings, "ACCESS_COOKIE_NAME", "access_token")
 REFRESH_COOKIE = getattr(settings, "REFRESH_COOKIE_NAME", "refresh_token")
 
+# Module-level jwt.encode/decode construct a fresh PyJWT() per call; reuse
+# one instance and pre-encode the secret so each token skips that setup.
+_JWT = jwt.PyJWT()
+_SECRET_BYTES = JWT_SECRET.encode("utf-8")
+
 
 def utcnow() -> datetime:
     return datetime.now(timezone.utc)
@@ -76,7 +115,7 @@ def create_access_token(
     }
     if extra:
         payload.update(extra)
-    return jwt.encode(payload, JWT_SECRET, algorithm=JWT_ALG)
+    return _JWT.encode(payload, _SECRET_BYTES, algorithm=JWT_ALG)
 
 
 def create_refresh_token(
@@ -94,26 +133,75 @@ def create_refresh_token(
         "iat": int(now.timestamp()),
         "exp": int((now + timedelta(days=ttl_days)).timestamp()),
     }
-    return jwt.encode(payload, JWT_SECRET, algorithm=JWT_ALG)
+    return _JWT.encode(payload, _SECRET_BYTES, algorithm=JWT_ALG)
+
+
+# Successful decodes are cached by raw token so polling clients don't pay
+# HMAC + JSON work on every request. TTL stays well under ACCESS_TTL_MIN*60,
+# and each hit still re-checks `exp` so expiry fires on time.
+_DECODE_CACHE: TTLCache = TTLCache(maxsize=4096, ttl=60)
+_DECODE_CACHE_LOCK = threading.Lock()
 
 
 def decode_token(token: str) -> Dict[str, Any]:
+    with _DECODE_CACHE_LOCK:
+        cached = _DECODE_CACHE.get(token)
+    if cached is not None:
+        if cached.get("exp", 0) <= utcnow().timestamp():
+            raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Token expired")
+        return cached
+
     try:
-        return jwt.decode(token, JWT_SECRET, algorithms=[JWT_ALG])
+        payload = _JWT.decode(
+            token,
+            _SECRET_BYTES,
+            algorithms=[JWT_ALG],
+            options={"require": ["exp", "sub", "typ"]},
+        )
     except jwt.ExpiredSignatureError:
         raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Token expired")
     except jwt.InvalidTokenError:
         raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Invalid token")
 
+    with _DECODE_CACHE_LOCK:
+        _DECODE_CACHE[token] = payload
+    return payload
+
+
+def decode_token_noraise(token: str) -> Optional[Dict[str, Any]]:
+    """decode_token for callers where a bad/expired token is a normal outcome.
+
+    Returns None instead of raising, so probe paths like /session don't pay
+    exception setup/teardown on every page load with a stale cookie.
+    """
+    with _DECODE_CACHE_LOCK:
+        cached = _DECODE_CACHE.get(token)
+    if cached is not None:
+        return None if cached.get("exp", 0) <= utcnow().timestamp() else cached
+
+    try:
+        payload = _JWT.decode(
+            token,
+            _SECRET_BYTES,
+            algorithms=[JWT_ALG],
+            options={"require": ["exp", "sub", "typ"]},
+        )
+    except jwt.InvalidTokenError:
+        return None
+
+    with _DECODE_CACHE_LOCK:
+        _DECODE_CACHE[token] = payload
+    return payload
+
 
 def require_token_type(payload: Dict[str, Any], typ: str) -> Dict[str, Any]:
+    # `exp`/`sub`/`typ` presence is enforced by decode_token's options["require"],
+    # so this only needs to compare the type claim.
     if payload.get("typ") != typ:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail=f"Wrong token type (need {typ})",
         )
-    if not payload.get("sub"):
-        raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Token missing subject")
     return payload
 
 
@@ -136,6 +224,36 @@ def _cookie_domain() -> Optional[str]:
     return None
 
 
+# Cookie flags come from settings and never change at runtime; resolve them
+# once at import instead of on every set/clear call.
+_SECURE = _cookie_secure()
+_SAMESITE = _cookie_samesite()
+_DOMAIN = _cookie_domain()
+
+
+def _fast_set_cookie(
+    resp: Response,
+    name: str,
+    value: str,
+    *,
+    max_age: Optional[int] = None,
+    path: str = "/",
+) -> None:
+    # Starlette's set_cookie routes through http.cookies.SimpleCookie, which
+    # is regex-heavy. Our values are JWTs (base64url + dots), so the header
+    # is a trivial fixed format we can append to raw_headers directly.
+    parts = [f"{name}={value}", f"Path={path}", "HttpOnly", f"SameSite={_SAMESITE}"]
+    if max_age is not None:
+        parts.append(f"Max-Age={max_age}")
+        if max_age <= 0:
+            parts.append("Expires=Thu, 01 Jan 1970 00:00:00 GMT")
+    if _SECURE:
+        parts.append("Secure")
+    if _DOMAIN:
+        parts.append(f"Domain={_DOMAIN}")
+    resp.raw_headers.append((b"set-cookie", "; ".join(parts).encode("latin-1")))
+
+
 def set_auth_cookies(
     resp: Response,
     *,
@@ -144,40 +262,16 @@ def set_auth_cookies(
     remember: bool = True,
 ) -> None:
 
-    secure = _cookie_secure()
-    samesite = _cookie_samesite()
-    domain = _cookie_domain()
-
-    resp.set_cookie(
-        key=ACCESS_COOKIE,
-        value=access_token,
-        httponly=True,
-        secure=secure,
-        samesite=samesite,
-        path="/",
-        domain=domain,
-        max_age=ACCESS_TTL_MIN * 60,
-    )
-
+    _fast_set_cookie(resp, ACCESS_COOKIE, access_token, max_age=ACCESS_TTL_MIN * 60)
 
     if refresh_token is not None:
         max_age = (REFRESH_TTL_DAYS * 24 * 60 * 60) if remember else None
-        resp.set_cookie(
-            key=REFRESH_COOKIE,
-            value=refresh_token,
-            httponly=True,
-            secure=secure,
-            samesite=samesite,
-            path="/",
-            domain=domain,
-            max_age=max_age,
-        )
+        _fast_set_cookie(resp, REFRESH_COOKIE, refresh_token, max_age=max_age)
 
 
 def clear_auth_cookies(resp: Response) -> None:
-    domain = _cookie_domain()
-    resp.delete_cookie(key=ACCESS_COOKIE, path="/", domain=domain)
-    resp.delete_cookie(key=REFRESH_COOKIE, path="/", domain=domain)
+    _fast_set_cookie(resp, ACCESS_COOKIE, "", max_age=0)
+    _fast_set_cookie(resp, REFRESH_COOKIE, "", max_age=0)
 
 
 def get_cookie_tokens(req: Request) -> Tuple[Optional[str], Optional[str]]:
@@ -215,14 +309,18 @@ def auth_fail(detail: str = "Not authenticated") -> HTTPException:
 
 
 def get_access_token_from_request(req: Request) -> Optional[str]:
-    auth = req.headers.get("authorization") or req.headers.get("Authorization")
-    if isinstance(auth, str):
-        parts = auth.strip().split()
-        if len(parts) == 2 and parts[0].lower() == "bearer" and parts[1].strip():
-            return parts[1].strip()
-
-    access_cookie, _refresh_cookie = get_cookie_tokens(req)
-    return access_cookie
+    # Starlette headers are case-insensitive, so one lookup suffices. Return
+    # early on a bearer hit so req.cookies (SimpleCookie parsing) is only
+    # touched when the header is absent.
+    auth = req.headers.get("authorization")
+    if auth:
+        sp = auth.find(" ")
+        if sp != -1 and auth[:sp].lower() == "bearer":
+            token = auth[sp + 1 :].strip()
+            if token:
+                return token
+
+    return req.cookies.get(ACCESS_COOKIE)
 
 
 def require_access_payload(req: Request) -> Dict[str, Any]:
@@ -16,6 +16,8 @@ from routers import (
 )
 from routers.closed_trades import router as closed_trades_router  # ✅ move here
 from routers.activity import router as activity_router
+from routers.history import close_poly_client
+from routers.portfolio import close_http_client
 
 
 load_dotenv()
@@ -38,14 +40,29 @@ async def startup():
     await users.create_index("email", unique=True)
     await users.create_index("username", unique=True)
     await db["activity_thesis"].create_index("trade_id", unique=True)
+    # index-backed sorts for the activity endpoints (latest/recent)
+    await db["activity_trades"].create_index([("trade_date", 1), ("ticker", 1), ("side", 1)])
+    await db["activity_trades"].create_index([("trade_date", -1), ("ticker", 1), ("side", 1)])
+    # closed-trades: SELL grouping + the prev-snapshot $lookup
+    await db["activity_trades"].create_index([("side", 1), ("trade_date", 1)])
+    await db["snapshots"].create_index([("as_of", -1), ("positions.ticker", 1)])
+    await db["snapshots"].create_index([("as_of", 1)])
+    # performance ingest upserts match on date
+    await db["performance_daily"].create_index([("date", 1)])
+    # one live-price doc per ticker; backs the $in lookups and refresh upserts
+    await db["prices_latest"].create_index("ticker", unique=True)
     # in main.py startup()
     await db["newsletter_posts"].create_index("slug", unique=True)
     await db["newsletter_posts"].create_index([("created_at", -1)])
+    # covers the public list query (published + optional kind, newest first)
+    await db["newsletter_posts"].create_index([("published", 1), ("kind", 1), ("created_at", -1)])
 
 
 
 @app.on_event("shutdown")
 async def shutdown():
+    await close_poly_client()
+    await close_http_client()
     await close_db()
 
 app.include_router(health.router)
@@ -1,24 +1,32 @@
 # routers/activity.py
 from __future__ import annotations
 
+from math import isnan
 from typing import Any, List, Optional
 
 from fastapi import APIRouter, Query
+from fastapi.responses import ORJSONResponse
 from pydantic import BaseModel
 from datetime import datetime, timezone, timedelta
 
 
-from core.db import get_db
+from core.db import get_db, get_db_read
 
-router = APIRouter(tags=["Activity"])
+router = APIRouter(tags=["Activity"], default_response_class=ORJSONResponse)
 
 
 def _coerce_float(x: Any, default: float = 0.0) -> float:
+    # Called per row in the hot loops below; most inputs are already numeric,
+    # so branch on type before paying for try/float().
+    if type(x) is float:
+        return default if isnan(x) else x
+    if type(x) is int:
+        return float(x)
+    if x is None:
+        return default
     try:
         v = float(x)
-        if v != v:
-            return default
-        return v
+        return default if isnan(v) else v
     except Exception:
         return default
 
@@ -27,6 +35,36 @@ def _norm_date(s: str) -> str:
     return str(s or "")[:10]
 
 
+# The latest trade_date only changes on ingest, but both endpoints were
+# paying a find_one round-trip for it on every poll. Cache it briefly;
+# ingest_activity calls invalidate_latest_trade_date() after writing.
+_LATEST_DATE_TTL_SEC = 30.0
+_latest_date_cache: tuple[float, Optional[str]] | None = None
+
+
+def invalidate_latest_trade_date() -> None:
+    global _latest_date_cache
+    _latest_date_cache = None
+
+
+async def _latest_trade_date(trades) -> Optional[str]:
+    global _latest_date_cache
+
+    now = datetime.now(timezone.utc).timestamp()
+    cached = _latest_date_cache
+    if cached is not None and (now - cached[0]) <= _LATEST_DATE_TTL_SEC:
+        return cached[1]
+
+    doc = await trades.find_one(
+        {},
+        projection={"_id": 0, "trade_date": 1},
+        sort=[("trade_date", -1)],
+    )
+    latest = _norm_date(doc.get("trade_date")) if doc else None
+    _latest_date_cache = (now, latest)
+    return latest
+
+
 class ActivityRowOut(BaseModel):
     trade_date: str
     ticker: str
@@ -42,7 +80,12 @@ class ActivityLatestResp(BaseModel):
     count: int
 
 
-@router.get("/api/history/activity/latest", response_model=ActivityLatestResp)
+@router.get(
+    "/api/history/activity/latest",
+    response_model=None,
+    response_class=ORJSONResponse,
+    responses={200: {"model": ActivityLatestResp}},
+)
 async def latest_activity(
     limit: int = Query(200, ge=1, le=2000),
     date: Optional[str] = Query(None, pattern=r"^\d{4}-\d{2}-\d{2}$"),
@@ -52,42 +95,43 @@ async def latest_activity(
     - `date` if provided
     - else the latest trade_date found in activity_trades
     """
-    db = get_db()
+    db = get_db_read()
     trades = db["activity_trades"]
 
     if date:
         trade_date = date
     else:
-        latest = await trades.find_one(
-            {},
-            projection={"_id": 0, "trade_date": 1},
-            sort=[("trade_date", -1)],
-        )
+        latest = await _latest_trade_date(trades)
         if not latest:
             return {"trade_date": "—", "data": [], "count": 0}
-        trade_date = _norm_date(latest.get("trade_date"))
+        trade_date = latest
 
-    rows = await trades.find(
+    # batch_size pipelines BSON decode with the transform loop below instead
+    # of materializing the whole result via to_list first.
+    cursor = trades.find(
         {"trade_date": trade_date},
         projection={"_id": 0, "trade_date": 1, "ticker": 1, "side": 1, "qty": 1, "price": 1},
-    ).sort([("ticker", 1), ("side", 1)]).limit(limit).to_list(length=limit)
-
-    out: List[ActivityRowOut] = []
-    for r in rows:
-        qty = _coerce_float(r.get("qty"), 0.0)
+    ).sort([("ticker", 1), ("side", 1)]).limit(limit).batch_size(500)
+
+    # Rows come from our own ingest, so skip the per-row Pydantic validation
+    # and let orjson serialize plain dicts (ActivityLatestResp documents the shape).
+    _coerce = _coerce_float  # LOAD_FAST in the per-row loop
+    out: List[dict] = []
+    append = out.append
+    async for r in cursor:
+        qty = _coerce(r.get("qty"), 0.0)
         price = r.get("price")
         price_f = float(price) if isinstance(price, (int, float)) else None
-        value = (price_f * qty) if (price_f is not None) else None
-
-        out.append(
-            ActivityRowOut(
-                trade_date=trade_date,
-                ticker=str(r.get("ticker") or "").upper().strip(),
-                side=str(r.get("side") or "").upper().strip(),
-                qty=float(qty),
-                price=price_f,
-                value=float(value) if isinstance(value, (int, float)) else None,
-            )
+
+        append(
+            {
+                "trade_date": trade_date,
+                "ticker": str(r.get("ticker") or "").upper().strip(),
+                "side": str(r.get("side") or "").upper().strip(),
+                "qty": float(qty),
+                "price": price_f,
+                "value": (price_f * qty) if price_f is not None else None,
+            }
         )
     return {"trade_date": trade_date, "data": out, "count": len(out)}
 
@@ -98,7 +142,12 @@ class ActivityRecentResp(BaseModel):
     count: int
 
 
-@router.get("/api/history/activity/recent", response_model=ActivityRecentResp)
+@router.get(
+    "/api/history/activity/recent",
+    response_model=None,
+    response_class=ORJSONResponse,
+    responses={200: {"model": ActivityRecentResp}},
+)
 async def recent_activity(
     days: int = Query(30, ge=1, le=120),
     limit: int = Query(2000, ge=1, le=20000),
@@ -108,18 +157,14 @@ async def recent_activity(
     ending at the latest trade_date in activity_trades.
     """
 
-    db = get_db()
+    db = get_db_read()
     trades = db["activity_trades"]
 
-    latest = await trades.find_one(
-        {},
-        projection={"_id": 0, "trade_date": 1},
-        sort=[("trade_date", -1)],
-    )
+    latest = await _latest_trade_date(trades)
     if not latest:
         return {"start_date": "—", "end_date": "—", "data": [], "count": 0}
 
-    end_date = _norm_date(latest.get("trade_date"))
+    end_date = latest
 
     # Compute start_date = end_date - (days-1)
     try:
@@ -129,31 +174,33 @@ async def recent_activity(
     except Exception:
         start_date = end_date  # fallback
 
-    rows = await trades.find(
+    cursor = trades.find(
         {"trade_date": {"$gte": start_date, "$lte": end_date}},
         projection={"_id": 0, "trade_date": 1, "ticker": 1, "side": 1, "qty": 1, "price": 1},
-    ).sort([("trade_date", -1), ("ticker", 1), ("side", 1)]).limit(limit).to_list(length=limit)
-
-    out: List[ActivityRowOut] = []
-    for r in rows:
-        qty = _coerce_float(r.get("qty"), 0.0)
+    ).sort([("trade_date", -1), ("ticker", 1), ("side", 1)]).limit(limit).batch_size(500)
+
+    # Same plain-dict egress as latest_activity: rows come from our own
+    # ingest, so skip per-row model validation and let orjson do the work.
+    # Streaming matters most here, where limit can reach 20k rows.
+    _coerce = _coerce_float
+    _norm = _norm_date
+    out: List[dict] = []
+    append = out.append
+    async for r in cursor:
+        qty = _coerce(r.get("qty"), 0.0)
         price = r.get("price")
         price_f = float(price) if isinstance(price, (int, float)) else None
-        value = (price_f * qty) if (price_f is not None) else None
-
-        out.append(
-            ActivityRowOut(
-                trade_id="",  # not used anymore, but required by your current model
-                trade_date=_norm_date(r.get("trade_date")),
-                ticker=str(r.get("ticker") or "").upper().strip(),
-                side=str(r.get("side") or "").upper().strip(),
-                qty=float(qty),
-                price=price_f,
-                value=float(value) if isinstance(value, (int, float)) else None,
-                thesis=None,
-            )
+
+        append(
+            {
+                "trade_date": _norm(r.get("trade_date")),
+                "ticker": str(r.get("ticker") or "").upper().strip(),
+                "side": str(r.get("side") or "").upper().strip(),
+                "qty": float(qty),
+                "price": price_f,
+                "value": (price_f * qty) if price_f is not None else None,
+            }
         )
 
-    # If you want to fully remove trade_id/thesis, we should also simplify ActivityRowOut model.
     return {"start_date": start_date, "end_date": end_date, "data": out, "count": len(out)}
 
@@ -1,35 +1,51 @@
 # routes/auth.py
 from __future__ import annotations
 
+import asyncio
 import re
 from datetime import datetime, timezone
 from typing import Literal, Optional
 
 from fastapi import APIRouter, HTTPException, Request
-from fastapi.responses import JSONResponse
-from pydantic import BaseModel, Field
+from fastapi.responses import JSONResponse, ORJSONResponse
+from pydantic import BaseModel, Field, field_validator
 
 from bson import ObjectId
+from pymongo.errors import DuplicateKeyError
 
-from core.db import get_db
+from core.db import get_collection
 from core.security import (
-    hash_password,
-    verify_password,
+    hash_password_async,
+    verify_password_async,
+    password_needs_rehash,
     create_access_token,
     create_refresh_token,
     refresh_access_from_refresh,
     decode_token,
+    decode_token_noraise,
     require_token_type,
     get_cookie_tokens,
     set_auth_cookies,
     clear_auth_cookies,
 )
 
-router = APIRouter(prefix="/api/auth", tags=["Auth"])
+router = APIRouter(prefix="/api/auth", tags=["Auth"], default_response_class=ORJSONResponse)
 
 Role = Literal["user", "editor", "admin"]
 
 EMAIL_RE = re.compile(r"^[^\s@]+@[^\s@]+\.[^\s@]+$")
+USERNAME_RE = re.compile(r"^[A-Za-z0-9_]+$")
+BEARER_RE = re.compile(r"^[Bb]earer\s+(\S+)\s*$")
+
+# Strong refs for fire-and-forget writes (e.g. last_login_at) so the tasks
+# aren't garbage-collected before they run.
+_BG_TASKS: set[asyncio.Task] = set()
+
+
+def _spawn_bg(coro) -> None:
+    task = asyncio.create_task(coro)
+    _BG_TASKS.add(task)
+    task.add_done_callback(_BG_TASKS.discard)
 
 
 def norm_email(s: str) -> str:
@@ -48,7 +64,7 @@ def validate_username(u: str) -> None:
     u = (u or "").strip()
     if len(u) < 3 or len(u) > 24:
         raise HTTPException(status_code=400, detail="Username must be 3–24 characters.")
-    if not re.match(r"^[A-Za-z0-9_]+$", u):
+    if not USERNAME_RE.match(u):
         raise HTTPException(
             status_code=400,
             detail="Username can only use letters, numbers, and underscore.",
@@ -61,11 +77,28 @@ class RegisterReq(BaseModel):
     password: str = Field(min_length=5)
     remember: bool = True
 
+    # normalize once at parse time instead of in the handler; passwords are
+    # deliberately left untouched (whitespace is significant there)
+    @field_validator("email")
+    @classmethod
+    def _norm_email(cls, v: str) -> str:
+        return (v or "").strip().lower()
+
+    @field_validator("username")
+    @classmethod
+    def _norm_username(cls, v: str) -> str:
+        return (v or "").strip()
+
 
 class LoginReq(BaseModel):
     emailOrUser: str
     password: str
     remember: bool = True
+
+    @field_validator("emailOrUser")
+    @classmethod
+    def _norm_id(cls, v: str) -> str:
+        return (v or "").strip()
     
 class ChangeMyPasswordReq(BaseModel):
     current_password: str
@@ -86,8 +119,7 @@ async def _current_user_from_access(req: Request) -> dict:
 
     sub = str(payload["sub"])
 
-    db = get_db()
-    users = db["users"]
+    users = get_collection("users")
     user = await users.find_one(
         {"_id": _oid(sub)},
         {"password_hash": 1, "passwordHash": 1, "role": 1, "is_active": 1},
@@ -115,16 +147,13 @@ def _oid(sub: str) -> ObjectId:
 
 
 def _bearer_token(req: Request) -> Optional[str]:
-    h = req.headers.get("authorization") or req.headers.get("Authorization")
+    # Starlette headers are case-insensitive, so one lookup is enough; the
+    # compiled regex extracts the token without the split/lower allocations.
+    h = req.headers.get("authorization")
     if not h:
         return None
-    parts = h.split(" ", 1)
-    if len(parts) != 2:
-        return None
-    if parts[0].lower() != "bearer":
-        return None
-    t = parts[1].strip()
-    return t if t else None
+    m = BEARER_RE.match(h)
+    return m.group(1) if m else None
 
 
 def _get_access_token(req: Request) -> Optional[str]:
@@ -137,8 +166,8 @@ def _get_access_token(req: Request) -> Optional[str]:
 
 @router.post("/register")
 async def register(body: RegisterReq):
-    email = norm_email(body.email)
-    username = norm_user(body.username)
+    email = body.email  # normalized by the model validators
+    username = body.username
     password = body.password or ""
 
     if not email or not is_email(email):
@@ -150,16 +179,9 @@ async def register(body: RegisterReq):
     if len(password) < 5:
         raise HTTPException(status_code=400, detail="Password must be at least 5 characters.")
 
-    db = get_db()
-    users = db["users"]
-
-    existing = await users.find_one({"$or": [{"email": email}, {"username": username}]})
-    if existing:
-        if existing.get("email") == email:
-            raise HTTPException(status_code=409, detail="Email already in use.")
-        raise HTTPException(status_code=409, detail="Username already taken.")
+    users = get_collection("users")
 
-    pw_hash = hash_password(password)
+    pw_hash = await hash_password_async(password)
     now = datetime.now(timezone.utc)
 
     doc = {
@@ -173,7 +195,15 @@ async def register(body: RegisterReq):
         "last_login_at": None,
     }
 
-    ins = await users.insert_one(doc)
+    # The unique indexes on email/username (created at startup) make the old
+    # $or existence precheck redundant and racy; let the insert tell us.
+    try:
+        ins = await users.insert_one(doc)
+    except DuplicateKeyError as e:
+        key_pattern = (e.details or {}).get("keyPattern") or {}
+        if "email" in key_pattern:
+            raise HTTPException(status_code=409, detail="Email already in use.")
+        raise HTTPException(status_code=409, detail="Username already taken.")
     sub = str(ins.inserted_id)
 
     access = create_access_token(sub=sub, extra={"role": doc["role"]})
@@ -192,15 +222,17 @@ async def login(body: LoginReq):
     if not q:
         raise HTTPException(status_code=400, detail="Missing email/username")
 
-    db = get_db()
-    users = db["users"]
+    users = get_collection("users")
 
-    user = await users.find_one(q)
+    user = await users.find_one(
+        q,
+        {"_id": 1, "password_hash": 1, "passwordHash": 1, "role": 1, "is_active": 1},
+    )
     if not user or not user.get("is_active", True):
         raise HTTPException(status_code=401, detail="Invalid credentials")
 
     pw_hash = user.get("password_hash") or user.get("passwordHash")
-    if not isinstance(pw_hash, str) or not verify_password(body.password, pw_hash):
+    if not isinstance(pw_hash, str) or not await verify_password_async(body.password, pw_hash):
         raise HTTPException(status_code=401, detail="Invalid credentials")
 
     sub = str(user.get("_id"))
@@ -209,10 +241,16 @@ async def login(body: LoginReq):
     access = create_access_token(sub=sub, extra={"role": role})
     refresh = create_refresh_token(sub=sub)
 
-    await users.update_one(
-        {"_id": user["_id"]},
-        {"$set": {"last_login_at": datetime.now(timezone.utc)}},
-    )
+    now = datetime.now(timezone.utc)
+    update: dict = {"last_login_at": now}
+    # migrate legacy bcrypt hashes to argon2 while we have the plaintext
+    if password_needs_rehash(pw_hash):
+        update["password_hash"] = await hash_password_async(body.password)
+        update["updated_at"] = now
+
+    # Not worth a round-trip on the login latency path; the write lands in
+    # the background while the response goes out.
+    _spawn_bg(users.update_one({"_id": user["_id"]}, {"$set": update}))
 
 
     resp = JSONResponse({"ok": True, "redirect": "/portfolio", "access_token": access})
@@ -227,17 +265,16 @@ async def change_password(req: Request, body: ChangeMyPasswordReq):
     user = await _current_user_from_access(req)
 
     pw_hash = user.get("password_hash") or user.get("passwordHash")
-    if not isinstance(pw_hash, str) or not verify_password(body.current_password, pw_hash):
+    if not isinstance(pw_hash, str) or not await verify_password_async(body.current_password, pw_hash):
         raise HTTPException(status_code=401, detail="Invalid current password")
 
     if len(body.new_password or "") < 5:
         raise HTTPException(status_code=400, detail="Password must be at least 5 characters.")
 
-    new_hash = hash_password(body.new_password)
+    new_hash = await hash_password_async(body.new_password)
     now = datetime.now(timezone.utc)
 
-    db = get_db()
-    users = db["users"]
+    users = get_collection("users")
     await users.update_one(
         {"_id": user["_id"]},
         {"$set": {"password_hash": new_hash, "updated_at": now}},
@@ -261,11 +298,10 @@ async def admin_set_password(req: Request, body: AdminSetPasswordReq):
     except Exception:
         raise HTTPException(status_code=400, detail="Invalid userId")
 
-    new_hash = hash_password(body.new_password)
+    new_hash = await hash_password_async(body.new_password)
     now = datetime.now(timezone.utc)
 
-    db = get_db()
-    users = db["users"]
+    users = get_collection("users")
 
     res = await users.update_one(
         {"_id": target_oid},
@@ -304,8 +340,7 @@ async def me(req: Request):
 
     sub = str(payload["sub"])
 
-    db = get_db()
-    users = db["users"]
+    users = get_collection("users")
     user = await users.find_one(
         {"_id": _oid(sub)},
         {"role": 1, "email": 1, "username": 1, "is_active": 1},
@@ -333,8 +368,7 @@ async def refresh(req: Request):
     require_token_type(payload, "refresh")
     sub = str(payload["sub"])
 
-    db = get_db()
-    users = db["users"]
+    users = get_collection("users")
     user = await users.find_one({"_id": _oid(sub)}, {"role": 1, "is_active": 1})
     if not user or not user.get("is_active", True):
         raise HTTPException(status_code=401, detail="Invalid refresh")
@@ -351,33 +385,29 @@ async def session(req: Request):
     access_token = _get_access_token(req)
     _access_cookie, refresh_token = get_cookie_tokens(req)
 
+    # Expired/invalid cookies are the normal case here, so probe with the
+    # noraise decode instead of paying an exception per page load. With a
+    # live access token this returns without touching Mongo at all.
     if access_token:
-        try:
-            payload = decode_token(access_token)
-            require_token_type(payload, "access")
+        payload = decode_token_noraise(access_token)
+        if payload is not None and payload.get("typ") == "access":
             return {"ok": True, "redirect": "/portfolio"}
-        except HTTPException:
-            pass
-
 
     if refresh_token:
-        try:
-            payload = decode_token(refresh_token)
-            require_token_type(payload, "refresh")
+        payload = decode_token_noraise(refresh_token)
+        if payload is not None and payload.get("typ") == "refresh":
             sub = str(payload["sub"])
 
-            db = get_db()
-            users = db["users"]
-            user = await users.find_one({"_id": _oid(sub)}, {"role": 1, "is_active": 1})
+            users = get_collection("users")
+            user = await users.find_one(
+                {"_id": _oid(sub)}, {"_id": 0, "role": 1, "is_active": 1}
+            )
             if not user or not user.get("is_active", True):
                 return {"ok": False}
 
             role = user.get("role") or "user"
             new_access = refresh_access_from_refresh(refresh_token, extra={"role": role})
 
-
             return {"ok": True, "redirect": "/portfolio", "access_token": new_access}
-        except HTTPException:
-            pass
 
     return {"ok": False}
\ No newline at end of file
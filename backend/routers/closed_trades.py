@@ -1,16 +1,27 @@
 # routers/closed_trades.py
 from __future__ import annotations
 
+import asyncio
+from collections import defaultdict
 from datetime import datetime, timezone
+from functools import lru_cache
 from typing import Any, Dict, List, Optional, Tuple
 
 from fastapi import APIRouter, Query
-from core.db import get_db
+from fastapi.responses import ORJSONResponse
+from core.db import get_collection
 
 # Import these helpers from portfolio.py (or duplicate them)
 from routers.portfolio import _parse_iso_date, _is_cash_like_ticker, _opened_at_map_from_activity_trades
 
-router = APIRouter(tags=["ClosedTrades"])
+router = APIRouter(tags=["ClosedTrades"], default_response_class=ORJSONResponse)
+
+# The ticker universe is small (hundreds of symbols), so this cache hits on
+# nearly every call in the per-row loops below.
+@lru_cache(maxsize=8192)
+def _norm_ticker(t: str) -> str:
+    return (t or "").upper().strip()
+
 
 def _coerce_float(x: Any, default: float = 0.0) -> float:
     try:
@@ -33,9 +44,7 @@ async def closed_trades(
       - opened_at from activity up to the prior snapshot date (for days held)
     """
 
-    db = get_db()
-    activity = db["activity_trades"]
-    snaps = db["snapshots"]
+    activity = get_collection("activity_trades")
 
     # 1) Group SELL activity by date+ticker (sum qty, sum proceeds)
     pipeline = [
@@ -60,15 +69,48 @@ async def closed_trades(
         },
         {"$sort": {"trade_date": -1}},
         {"$limit": int(limit)},
+        # Resolve the most recent prior snapshot containing this ticker inside
+        # the same aggregation, instead of one find_one round-trip per sell-day.
+        {
+            "$lookup": {
+                "from": "snapshots",
+                "let": {"td": "$trade_date", "tkr": "$ticker"},
+                "pipeline": [
+                    {
+                        "$match": {
+                            "$expr": {
+                                "$and": [
+                                    {"$lt": ["$as_of", "$$td"]},
+                                    {"$in": ["$$tkr", {"$ifNull": ["$positions.ticker", []]}]},
+                                ]
+                            }
+                        }
+                    },
+                    {"$sort": {"as_of": -1}},
+                    {"$limit": 1},
+                    {"$project": {"_id": 0, "as_of": 1, "positions": 1}},
+                ],
+                "as": "prev_snap",
+            }
+        },
     ]
 
     sell_days = await activity.aggregate(pipeline).to_list(length=limit)
 
     out: List[Dict[str, Any]] = []
 
+    # Rows awaiting opened_at resolution, plus tickers grouped by prev_as_of
+    # so one _opened_at_map_from_activity_trades call covers each distinct day.
+    pending: List[Tuple[str, str, str, Dict[str, Any]]] = []
+    groups: Dict[str, set] = defaultdict(set)
+
+    # {ticker: position} per prev snapshot day, built once and reused when
+    # several sell-days resolve to the same snapshot.
+    prev_pos_index: Dict[str, Dict[str, dict]] = {}
+
     for s in sell_days:
         trade_date = str(s.get("trade_date") or "")[:10]
-        ticker = str(s.get("ticker") or "").upper().strip()
+        ticker = _norm_ticker(str(s.get("ticker") or ""))
         if not trade_date or not ticker or _is_cash_like_ticker(ticker):
             continue
 
@@ -77,23 +119,24 @@ async def closed_trades(
         if qty_sold <= 0:
             continue
 
-        # 2) Find the most recent snapshot BEFORE the trade_date that includes this ticker
-        prev_snap = await snaps.find_one(
-            {"as_of": {"$lt": trade_date}, "positions.ticker": ticker},
-            projection={"_id": 0, "as_of": 1, "positions": 1},
-            sort=[("as_of", -1)],
-        )
+        # 2) Most recent snapshot BEFORE the trade_date that includes this ticker
+        # (resolved by the $lookup above)
+        prev_snaps = s.get("prev_snap") or []
+        prev_snap = prev_snaps[0] if prev_snaps else None
         if not prev_snap:
             continue
 
         prev_as_of = str(prev_snap.get("as_of") or "")[:10]
-        positions = prev_snap.get("positions") or []
 
-        prev_pos = None
-        for p in positions:
-            if isinstance(p, dict) and str(p.get("ticker") or "").upper().strip() == ticker:
-                prev_pos = p
-                break
+        idx = prev_pos_index.get(prev_as_of)
+        if idx is None:
+            idx = {
+                _norm_ticker(str(p.get("ticker") or "")): p
+                for p in (prev_snap.get("positions") or [])
+                if isinstance(p, dict)
+            }
+            prev_pos_index[prev_as_of] = idx
+        prev_pos = idx.get(ticker)
         if not prev_pos:
             continue
 
@@ -117,37 +160,55 @@ async def closed_trades(
         pnl_dollars = proceeds - cost_basis
         pnl_pct = (pnl_dollars / cost_basis) if cost_basis > 0 else None
 
-        # 4) opened_at / days held (use activity up to the prior snapshot date)
-        opened_map = await _opened_at_map_from_activity_trades(
-            start_date="2025-01-01",
-            end_date=prev_as_of,          # key: before the closing day
-            only_tickers=[ticker],
+        # 4) opened_at / days held resolved in one batch after the loop
+        pending.append(
+            (
+                ticker,
+                trade_date,
+                prev_as_of,
+                {
+                    "ticker": ticker,
+                    "open_date": None,
+                    "close_date": trade_date,
+                    "days_held": None,
+                    "qty": float(closed_qty),
+                    "avg_cost": float(avg_cost) if avg_cost else None,
+                    "sell_price": float(sell_price) if isinstance(sell_price, (int, float)) else None,
+                    "proceeds": float(proceeds),
+                    "cost_basis": float(cost_basis),
+                    "pnl_dollars": float(pnl_dollars),
+                    "pnl_pct": float(pnl_pct) if isinstance(pnl_pct, (int, float)) else None,
+                    "prev_snapshot_as_of": prev_as_of,
+                    "sell_count": int(s.get("sell_count") or 0),
+                },
+            )
         )
-        opened_at = opened_map.get(ticker)
-        opened_date = opened_at.date().isoformat() if opened_at else None
-
-        days_held = None
-        td = _parse_iso_date(trade_date)
-        if opened_at and td:
-            days_held = int((td.date() - opened_at.date()).days)
-
-        out.append(
-            {
-                "ticker": ticker,
-                "open_date": opened_date,
-                "close_date": trade_date,
-                "days_held": days_held,
-                "qty": float(closed_qty),
-                "avg_cost": float(avg_cost) if avg_cost else None,
-                "sell_price": float(sell_price) if isinstance(sell_price, (int, float)) else None,
-                "proceeds": float(proceeds),
-                "cost_basis": float(cost_basis),
-                "pnl_dollars": float(pnl_dollars),
-                "pnl_pct": float(pnl_pct) if isinstance(pnl_pct, (int, float)) else None,
-                "prev_snapshot_as_of": prev_as_of,
-                "sell_count": int(s.get("sell_count") or 0),
-            }
+        groups[prev_as_of].add(ticker)
+
+    if pending:
+        # One opened_at query per distinct prev_as_of (was one per sell-day),
+        # dispatched concurrently.
+        days = list(groups.keys())
+        opened_maps = await asyncio.gather(
+            *[
+                _opened_at_map_from_activity_trades(
+                    start_date="2025-01-01",
+                    end_date=d,               # key: before the closing day
+                    only_tickers=sorted(groups[d]),
+                )
+                for d in days
+            ]
         )
+        per_day_map = dict(zip(days, opened_maps))
+
+        for ticker, trade_date, prev_as_of, row in pending:
+            opened_at = per_day_map.get(prev_as_of, {}).get(ticker)
+            if opened_at:
+                row["open_date"] = opened_at.date().isoformat()
+                td = _parse_iso_date(trade_date)
+                if td:
+                    row["days_held"] = int((td.date() - opened_at.date()).days)
+            out.append(row)
 
     # newest closes first
     out.sort(key=lambda r: (r.get("close_date") or ""), reverse=True)
@@ -3,19 +3,48 @@ from __future__ import annotations
 
 import asyncio
 import re
+from functools import lru_cache
 from typing import Any, Optional
 
-import requests
+import httpx
+import orjson
+from cachetools import LRUCache
 from fastapi import APIRouter, Query
+from fastapi.responses import ORJSONResponse
 from pydantic import BaseModel, Field
 
 from core.config import settings
-from core.db import get_db
+from core.db import get_collection
 
-router = APIRouter(prefix="/history", tags=["History"])
+router = APIRouter(prefix="/history", tags=["History"], default_response_class=ORJSONResponse)
 
 ISO_DATE_RE = re.compile(r"^\d{4}-\d{2}-\d{2}$")
-_POLY_CLOSE_CACHE: dict[tuple[str, str], float] = {}
+
+# Bounded close-price cache plus an in-flight table so concurrent requests
+# for the same (ticker, date) share one Polygon call instead of racing.
+_POLY_CLOSE_CACHE: LRUCache = LRUCache(maxsize=4096)
+_POLY_INFLIGHT: dict[tuple[str, str], asyncio.Future] = {}
+
+# One keep-alive client for all Polygon calls; created lazily so importing
+# the module doesn't require a running event loop, closed on app shutdown.
+_POLY_CLIENT: Optional[httpx.AsyncClient] = None
+
+
+def _get_poly_client() -> httpx.AsyncClient:
+    global _POLY_CLIENT
+    if _POLY_CLIENT is None:
+        _POLY_CLIENT = httpx.AsyncClient(
+            timeout=8.0,
+            limits=httpx.Limits(max_keepalive_connections=32),
+        )
+    return _POLY_CLIENT
+
+
+async def close_poly_client() -> None:
+    global _POLY_CLIENT
+    if _POLY_CLIENT is not None:
+        await _POLY_CLIENT.aclose()
+        _POLY_CLIENT = None
 
 
 class TradeLine(BaseModel):
@@ -35,8 +64,34 @@ class ReceiptResp(BaseModel):
     trades: list[TradeLine] = []
 
 
-def snapshots_col(db):
-    return db["snapshots"]
+# warm the validator/serializer cores at import instead of on first request
+TradeLine.model_rebuild()
+ReceiptResp.model_rebuild()
+
+
+# history_receipts touches only these fields; the position subfield
+# projection drops everything else (avg_cost, descriptions, ...) from the
+# wire and BSON decode. "data" is the legacy alias _positions_list accepts.
+_RECEIPTS_PROJECTION = {
+    "_id": 0,
+    "as_of": 1,
+    "total_value": 1,
+    "cash_spaxx": 1,
+    "pending_amount": 1,
+    "non_cash_positions_value": 1,
+    "positions.ticker": 1,
+    "positions.symbol": 1,
+    "positions.quantity": 1,
+    "positions.last_price": 1,
+    "positions.market_value": 1,
+    "positions.value": 1,
+    "data.ticker": 1,
+    "data.symbol": 1,
+    "data.quantity": 1,
+    "data.last_price": 1,
+    "data.market_value": 1,
+    "data.value": 1,
+}
 
 
 def _is_cash_like_ticker(t: str) -> bool:
@@ -44,6 +99,12 @@ def _is_cash_like_ticker(t: str) -> bool:
     return bool(t) and t.endswith("**")
 
 
+# Small ticker universe -> near-100% hit rate in per-position loops.
+@lru_cache(maxsize=8192)
+def _norm_ticker(t: str) -> str:
+    return (t or "").upper().strip()
+
+
 def _float(x: Any) -> float:
     try:
         return float(x)
@@ -82,14 +143,19 @@ def _pos_map(doc: dict[str, Any]) -> dict[str, dict[str, Any]]:
         t = p.get("ticker") or p.get("symbol")
         if not t:
             continue
-        out[str(t).upper()] = p
+        t = str(t).upper()
+        # cash-like entries are skipped by every consumer; keep them out of
+        # the map so they never reach the union/sort in history_receipts
+        if t.endswith("**"):
+            continue
+        out[t] = p
     return out
 
 def compute_non_cash_value(positions: list[dict[str, Any]]) -> float:
     total = 0.0
     for p in positions:
-        t = str(p.get("ticker") or p.get("symbol") or "").upper().strip()
-        if not t or _is_cash_like_ticker(t):
+        t = _norm_ticker(str(p.get("ticker") or p.get("symbol") or ""))
+        if not t or t.endswith("**"):
             continue
 
         mv = p.get("market_value")
@@ -128,38 +194,46 @@ async def polygon_close(ticker: str, date: str) -> Optional[float]:
 
     tkr = ticker.upper()
     key = (tkr, date)
-    if key in _POLY_CLOSE_CACHE:
-        return _POLY_CLOSE_CACHE[key]
+    cached = _POLY_CLOSE_CACHE.get(key)
+    if cached is not None:
+        return cached
+
+    inflight = _POLY_INFLIGHT.get(key)
+    if inflight is not None:
+        return await inflight
 
     url = f"https://api.polygon.io/v1/open-close/{tkr}/{date}"
     params = {"adjusted": "true", "apiKey": api_key}
 
-    def _fetch() -> Optional[float]:
+    fut: asyncio.Future = asyncio.get_running_loop().create_future()
+    _POLY_INFLIGHT[key] = fut
+    try:
+        close_f: Optional[float] = None
         try:
-            r = requests.get(url, params=params, timeout=8)
-            if r.status_code != 200:
-                return None
-            data = r.json()
-            close = data.get("close")
-            if isinstance(close, (int, float)):
-                return float(close)
+            r = await _get_poly_client().get(url, params=params)
+            if r.status_code == 200:
+                close = r.json().get("close")
+                if isinstance(close, (int, float)):
+                    close_f = float(close)
         except Exception:
-            return None
-        return None
-
-    close_f = await asyncio.to_thread(_fetch)
-    if close_f is not None:
-        _POLY_CLOSE_CACHE[key] = close_f
+            close_f = None
+        if close_f is not None:
+            _POLY_CLOSE_CACHE[key] = close_f
+        fut.set_result(close_f)
+    except BaseException as e:
+        fut.set_exception(e)
+        raise
+    finally:
+        _POLY_INFLIGHT.pop(key, None)
     return close_f
 
 
 @router.get("/receipts", response_model=list[ReceiptResp])
 async def history_receipts(limit: int = Query(30, ge=1, le=365)):
-    db = get_db()
-    col = snapshots_col(db)
+    col = get_collection("snapshots")
 
     docs = await (
-        col.find({}, {"_id": 0})
+        col.find({}, _RECEIPTS_PROJECTION)
         .sort("as_of", -1)
         .limit(limit)
         .to_list(length=limit)
@@ -168,6 +242,13 @@ async def history_receipts(limit: int = Query(30, ge=1, le=365)):
     if not docs:
         return []
 
+    # Each doc (except the endpoints) is consumed twice: as `snap` and as the
+    # next iteration's `prev`. Materialize the positions map and net value
+    # once per doc instead of twice.
+    n = len(docs)
+    pos_maps = [_pos_map(d) for d in docs]
+    nets = [_net_value(d) for d in docs]
+
     receipts: list[ReceiptResp] = []
 
     for i, snap in enumerate(docs):
@@ -175,22 +256,25 @@ async def history_receipts(limit: int = Query(30, ge=1, le=365)):
         if not isinstance(as_of, str) or not ISO_DATE_RE.match(as_of):
             continue
 
-        prev = docs[i + 1] if i + 1 < len(docs) else None
+        has_prev = i + 1 < n
 
-        net_after = _net_value(snap)
-        net_before = _net_value(prev)
+        net_after = nets[i]
+        net_before = nets[i + 1] if has_prev else None
         delta = (net_after - net_before) if (net_after is not None and net_before is not None) else None
 
-        a = _pos_map(snap)
-        b = _pos_map(prev) if prev else {}
+        a = pos_maps[i]
+        b = pos_maps[i + 1] if has_prev else {}
 
         tickers = sorted(set(a.keys()) | set(b.keys()))
         trades: list[TradeLine] = []
 
-        for tkr in tickers:
-            if _is_cash_like_ticker(tkr):
-                continue
+        # Stage the diff rows first, collecting the tickers whose price has to
+        # come from Polygon, then fetch those concurrently instead of paying
+        # one HTTP round-trip per ticker in sequence.
+        staged: list[list] = []  # [tkr, side, qty, price_f, pa, pb]
+        need: list[int] = []
 
+        for tkr in tickers:
             pa = a.get(tkr, {})
             pb = b.get(tkr, {})
 
@@ -210,8 +294,17 @@ async def history_receipts(limit: int = Query(30, ge=1, le=365)):
 
             price_f = float(price) if isinstance(price, (int, float)) else None
             if price_f is None:
-                price_f = await polygon_close(tkr, as_of)
+                need.append(len(staged))
+            staged.append([tkr, side, qty, price_f, pa, pb])
+
+        if need:
+            fetched = await asyncio.gather(
+                *[polygon_close(staged[j][0], as_of) for j in need]
+            )
+            for j, close_f in zip(need, fetched):
+                staged[j][3] = close_f
 
+        for tkr, side, qty, price_f, pa, pb in staged:
             value_f: Optional[float] = None
             if price_f is not None:
                 value_f = float(price_f) * float(qty)
@@ -225,8 +318,11 @@ async def history_receipts(limit: int = Query(30, ge=1, le=365)):
                 if mv_now or mv_prev:
                     value_f = abs(mv_now - mv_prev)
 
+            # values are already validated floats/strs; model_construct skips
+            # the per-field validation pass (the response_model still
+            # validates once at the boundary)
             trades.append(
-                TradeLine(
+                TradeLine.model_construct(
                     ticker=tkr,
                     side=side,
                     qty=_round_qty(qty),
@@ -237,7 +333,7 @@ async def history_receipts(limit: int = Query(30, ge=1, le=365)):
 
         if trades or (delta is not None and abs(delta) > 1e-6):
             receipts.append(
-                ReceiptResp(
+                ReceiptResp.model_construct(
                     as_of=as_of,
                     receipt_id=f"rcpt-{as_of}",
                     net_after=float(net_after or 0.0),
@@ -259,7 +355,8 @@ async def history_events(limit: int = Query(30, ge=1, le=365)):
                 "date": r.as_of,
                 "title": "Trades (derived)",
                 "tag": "trades",
-                "detail": r.model_dump_json(),
+                # kept as a string — the timeline component JSON.parses it
+                "detail": orjson.dumps(r.model_dump()).decode(),
                 "href": "",
             }
         )
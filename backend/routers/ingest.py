@@ -5,19 +5,31 @@ import re
 import csv
 import hashlib
 from datetime import datetime, timezone
+from functools import lru_cache
 from typing import Any, Optional, Tuple
 
 import pandas as pd
+
+try:  # optional fast path; the python-engine parser stays as the fallback
+    import pyarrow as pa
+    import pyarrow.csv as pacsv
+except ImportError:  # pragma: no cover
+    pa = None
+    pacsv = None
+
 from fastapi import APIRouter, HTTPException, UploadFile, File, Query, Request
 from pydantic import BaseModel
+from pymongo import UpdateOne
 
 from core.security import decode_token, require_token_type, get_cookie_tokens
 from core.db import get_db
+from routers.activity import invalidate_latest_trade_date
+from routers.portfolio import invalidate_portfolio_cache
 
 router = APIRouter(prefix="/api/ingest", tags=["Ingest"])
 
 ISO_DATE_RE = re.compile(r"^\d{4}-\d{2}-\d{2}$")
-TICKER_RE = re.compile(r"^[A-Z]{1,7}(?:\.[A-Z]{1,3})?$")
+TICKER_RE = re.compile(r"^[A-Z]{1,7}(?:\.[A-Z]{1,3})?$", re.ASCII)
 
 
 # --------------------
@@ -67,12 +79,22 @@ def require_iso_date(d: str) -> str:
     return d
 
 
+_ZW_RE = re.compile(r"[\u200B-\u200D\uFEFF]")
+_WS_RE = re.compile(r"\s+")
+_MDY_RE = re.compile(r"^(\d{1,2})/(\d{1,2})/(\d{4})$")
+_MDY_TAIL_RE = re.compile(r"(\d{1,2})/(\d{1,2})/(\d{4})$")
+_SYM_CLEAN_RE = re.compile(r"[^A-Z0-9.*]")
+
+
+# Column names and needle strings repeat across every _find_col_* call, so
+# memoize instead of re-running the regex substitutions each time.
+@lru_cache(maxsize=4096)
 def _norm(s: str) -> str:
     s = str(s or "")
-    s = s.replace("\ufeff", "")
+    s = s.replace("\uFEFF", "")
     s = s.replace("\u00A0", " ")
-    s = re.sub(r"[\u200B-\u200D\uFEFF]", "", s)
-    s = re.sub(r"\s+", " ", s.strip().lower())
+    s = _ZW_RE.sub("", s)
+    s = _WS_RE.sub(" ", s.strip().lower())
     return s
 
 
@@ -90,11 +112,13 @@ def _find_col_contains(
     *,
     reject_any: list[str] | None = None,
 ) -> Optional[str]:
-    reject_any = reject_any or []
+    # normalize the needles once, not per column
+    needles = [_norm(k) for k in contains_any]
+    rejects = [_norm(r) for r in (reject_any or [])]
     for c in df.columns:
         nc = _norm(c)
-        if any(_norm(k) in nc for k in contains_any):
-            if any(_norm(r) in nc for r in reject_any):
+        if any(k in nc for k in needles):
+            if any(r in nc for r in rejects):
                 continue
             return c
     return None
@@ -126,6 +150,25 @@ def _to_float(v) -> Optional[float]:
         return None
 
 
+_DASH_RE = re.compile(r"[−–]")
+_NUM_CLEAN_RE = re.compile(r"[$,\s%]")
+
+
+def _to_float_vec(series: pd.Series) -> pd.Series:
+    """Vectorized `_to_float`: one regex pass + `pd.to_numeric` per column.
+
+    Returns a float Series with NaN where `_to_float` would return None.
+    """
+    s = series.astype(str).str.strip()
+    neg = s.str.startswith("(") & s.str.endswith(")")
+    s = s.str.strip("()").str.strip()
+    s = s.str.replace(_DASH_RE, "-", regex=True)
+    s = s.str.replace(_NUM_CLEAN_RE, "", regex=True)
+    s = s.str.lstrip("+")
+    x = pd.to_numeric(s, errors="coerce")
+    return x.where(~neg, -x)
+
+
 def _safe_float(x, default: float = 0.0) -> float:
     try:
         if x is None:
@@ -135,42 +178,59 @@ def _safe_float(x, default: float = 0.0) -> float:
         return float(default)
 
 
+# One compiled alternation scans the row once instead of running a separate
+# substring search per phrase (the sre engine shares prefix work much like an
+# Aho-Corasick automaton would, without a new dependency).
+_DISCLAIMER_RE = re.compile(
+    "|".join(
+        re.escape(p)
+        for p in (
+            "provided to you solely for your use",
+            "not for distribution",
+            "informational purposes only",
+            "not intended to provide advice",
+            "should not be used in place of your account statements",
+            "for more information on the data included",
+            "brokerage services are provided",
+            "members sipc",
+            "fidelity.com",
+            "date downloaded",
+            "custody and other services provided",
+        )
+    )
+)
+
+
 def _is_disclaimer_row(sym: str, desc: str) -> bool:
     blob = f"{sym} {desc}".strip().lower()
     if not blob:
         return True
-    bad_phrases = [
-        "provided to you solely for your use",
-        "not for distribution",
-        "informational purposes only",
-        "not intended to provide advice",
-        "should not be used in place of your account statements",
-        "for more information on the data included",
-        "brokerage services are provided",
-        "members sipc",
-        "fidelity.com",
-        "date downloaded",
-        "custody and other services provided",
-    ]
-    return any(p in blob for p in bad_phrases)
+    return _DISCLAIMER_RE.search(blob) is not None
 
 
+# The same handful of symbols recurs across the scorers, _ticker_like_rate,
+# and the ingest loops, so both helpers are memoized; the plain-letters fast
+# path below skips the regex for the overwhelmingly common case.
+@lru_cache(maxsize=8192)
 def _clean_symbol(raw_sym: str) -> str:
     s = (raw_sym or "").replace("\u00A0", " ").strip().upper()
     if not s:
         return ""
     if s.endswith("**"):
-        return re.sub(r"\s+", "", s)
-    s = re.sub(r"[^A-Z0-9\.\*]", "", s)
+        return _WS_RE.sub("", s)
+    s = _SYM_CLEAN_RE.sub("", s)
     return s.strip()
 
 
+@lru_cache(maxsize=8192)
 def _looks_like_symbol(sym: str) -> bool:
     if not sym:
         return False
     s = sym.strip().upper()
     if s.endswith("**"):
         return True
+    if len(s) <= 7 and s.isalpha() and s.isascii():
+        return True
     return bool(TICKER_RE.fullmatch(s))
 
 
@@ -196,14 +256,54 @@ def _read_csv_smart(raw: bytes) -> pd.DataFrame:
 
     delim = _sniff_delim(preview)
 
+    # Find the header line by scanning the raw bytes (no per-line string
+    # allocations); the line-by-line scan below stays as the fallback.
     header_idx: int | None = None
-    for i, line in enumerate(preview_lines[:180]):
-        lo = line.lower()
-        if ("symbol" in lo) and ("quantity" in lo):
-            header_idx = i
+    lower = raw[: 1 << 16].lower()
+    pos = lower.find(b"symbol")
+    while pos >= 0:
+        line_start = lower.rfind(b"\n", 0, pos) + 1
+        line_end = lower.find(b"\n", pos)
+        if line_end < 0:
+            line_end = len(lower)
+        if lower.find(b"quantity", line_start, line_end) >= 0:
+            idx = lower.count(b"\n", 0, line_start)
+            if idx < 180:
+                header_idx = idx
             break
+        pos = lower.find(b"symbol", line_end + 1)
+
+    if header_idx is None:
+        for i, line in enumerate(preview_lines[:180]):
+            lo = line.lower()
+            if ("symbol" in lo) and ("quantity" in lo):
+                header_idx = i
+                break
 
     def read_with(sep: str, skip: int = 0) -> pd.DataFrame:
+        # Arrow's C++ parser is several times faster than engine="python";
+        # files it rejects (ragged disclaimer tails, odd quoting) fall back.
+        if pacsv is not None and skip < len(preview_lines):
+            try:
+                names = next(csv.reader([preview_lines[skip]], delimiter=sep))
+                names = [
+                    str(n).strip() if str(n).strip() else f"Unnamed: {i}"
+                    for i, n in enumerate(names)
+                ]
+                tbl = pacsv.read_csv(
+                    pa.BufferReader(raw),
+                    read_options=pacsv.ReadOptions(
+                        skip_rows=skip + 1, column_names=names, block_size=1 << 20
+                    ),
+                    parse_options=pacsv.ParseOptions(delimiter=sep),
+                    convert_options=pacsv.ConvertOptions(
+                        column_types={n: pa.string() for n in names},
+                        strings_can_be_null=False,
+                    ),
+                )
+                return tbl.to_pandas()
+            except Exception:
+                pass
         return pd.read_csv(
             io.BytesIO(raw),
             sep=sep,
@@ -221,34 +321,61 @@ def _read_csv_smart(raw: bytes) -> pd.DataFrame:
 
     col_lc = [str(c).strip().lower() for c in df.columns]
     if ("symbol" not in col_lc) and (header_idx is not None):
-        df0 = pd.read_csv(
+        # Recover the header from just the first header_idx+1 lines and
+        # rename the frame we already parsed instead of re-reading the file.
+        hdr_only = pd.read_csv(
             io.BytesIO(raw),
             sep=delim,
             header=None,
+            nrows=header_idx + 1,
             engine="python",
             dtype=str,
             keep_default_na=False,
         )
-        hdr = df0.iloc[header_idx].astype(str).tolist()
-        df = df0.iloc[header_idx + 1 :].copy()
-        df.columns = [str(x).strip() for x in hdr]
+        hdr = hdr_only.iloc[header_idx].astype(str).tolist()
+        if len(hdr) == len(df.columns):
+            df = df.copy()
+            df.columns = [str(x).strip() for x in hdr]
+        else:
+            # widths disagree (ragged preamble) — full re-parse as before
+            df0 = pd.read_csv(
+                io.BytesIO(raw),
+                sep=delim,
+                header=None,
+                engine="python",
+                dtype=str,
+                keep_default_na=False,
+            )
+            hdr = df0.iloc[header_idx].astype(str).tolist()
+            df = df0.iloc[header_idx + 1 :].copy()
+            df.columns = [str(x).strip() for x in hdr]
 
     df.columns = [str(c).strip() for c in df.columns]
     df = df.dropna(how="all")
-    df = df.loc[:, ~df.columns.astype(str).str.match(r"^Unnamed")]
+    # filter by name only — a boolean .loc slice would copy every block
+    df = df[[c for c in df.columns if not str(c).startswith("Unnamed")]]
     return df
 
 
-async def _read_upload_table(file: UploadFile) -> Tuple[pd.DataFrame, bytes, str]:
+async def _read_upload_table(file: UploadFile) -> Tuple[pd.DataFrame, bytes, str, str]:
     filename = file.filename or "upload"
     name = filename.lower()
 
-    raw = await file.read()
+    # hash while reading so the digest runs over cache-hot 1 MiB chunks
+    # instead of a second full pass over the buffer afterwards
+    h = hashlib.sha256()
+    buf = bytearray()
+    while chunk := await file.read(1 << 20):
+        h.update(chunk)
+        buf.extend(chunk)
+    raw = bytes(buf)
     await file.close()
 
     if not raw:
         raise HTTPException(status_code=400, detail="Empty file")
 
+    sha256 = h.hexdigest()
+
     if name.endswith((".xlsx", ".xlsm")):
         try:
             bio = io.BytesIO(raw)
@@ -260,77 +387,55 @@ async def _read_upload_table(file: UploadFile) -> Tuple[pd.DataFrame, bytes, str
 
             df.columns = [str(c).strip() for c in df.columns]
             df = df.dropna(how="all")
-            df = df.loc[:, ~df.columns.astype(str).str.match(r"^Unnamed")]
-            return df, raw, filename
+            df = df[[c for c in df.columns if not str(c).startswith("Unnamed")]]
+            return df, raw, filename, sha256
         except Exception as e:
             raise HTTPException(status_code=400, detail=f"XLSX parse failed: {e}")
 
     if name.endswith((".csv", ".tsv")):
-        return _read_csv_smart(raw), raw, filename
+        return _read_csv_smart(raw), raw, filename, sha256
 
     raise HTTPException(status_code=400, detail="Upload must be a .csv/.tsv or .xlsx file")
 
 
+# The scorers sample the first 80 rows of every candidate column; doing that
+# with boolean masks over one cleaned Series keeps the work in pandas kernels
+# instead of per-cell Python calls.
+
 def _col_score_symbol(df: pd.DataFrame, col: str) -> int:
-    score = 0
-    for v in df[col].head(80).tolist():
-        s = _clean_symbol(str(v))
-        if not s:
-            continue
-        if s.endswith("**") or TICKER_RE.match(s):
-            score += 4
-        elif _looks_like_symbol(s):
-            score += 2
-        if len(s) > 12:
-            score -= 2
-    return score
+    s = df[col].head(80).astype(str).map(_clean_symbol)
+    s = s[s != ""]
+    if s.empty:
+        return 0
+    strict = s.str.endswith("**") | s.str.fullmatch(TICKER_RE)
+    loose = ~strict & s.map(_looks_like_symbol)
+    long = s.str.len() > 12
+    return int(4 * strict.sum() + 2 * loose.sum() - 2 * long.sum())
 
 
 def _col_score_qty(df: pd.DataFrame, col: str) -> int:
-    score = 0
-    for v in df[col].head(80).tolist():
-        x = _to_float(v)
-        if x is None:
-            continue
-        if abs(x) <= 1_000_000:
-            score += 3
-        else:
-            score -= 1
-    return score
+    x = _to_float_vec(df[col].head(80))
+    valid = x.notna()
+    small = valid & (x.abs() <= 1_000_000)
+    return int(3 * small.sum() - (valid & ~small).sum())
 
 
 def _col_score_price(df: pd.DataFrame, col: str) -> int:
-    score = 0
-    neg = 0
-    n = 0
-    for v in df[col].head(80).tolist():
-        x = _to_float(v)
-        if x is None:
-            continue
-        n += 1
-        if x < 0:
-            neg += 1
-        if 0 <= x <= 100_000:
-            score += 2
-    if n > 0 and (neg / n) > 0.15:
+    x = _to_float_vec(df[col].head(80))
+    valid = x.notna()
+    n = int(valid.sum())
+    score = int(2 * ((x >= 0) & (x <= 100_000) & valid).sum())
+    if n > 0 and int((valid & (x < 0)).sum()) / n > 0.15:
         score -= 20
     return score
 
 
 def _col_score_value(df: pd.DataFrame, col: str) -> int:
-    score = 0
-    neg = 0
-    n = 0
-    for v in df[col].head(80).tolist():
-        x = _to_float(v)
-        if x is None:
-            continue
-        n += 1
-        if x < 0:
-            neg += 1
-        if abs(x) <= 50_000_000:
-            score += 2
-    if n > 0 and (neg / n) > 0.25:
+    x = _to_float_vec(df[col].head(80))
+    valid = x.notna()
+    n = int(valid.sum())
+    score = int(2 * ((x.abs() <= 50_000_000) & valid).sum())
+    if n > 0 and int((valid & (x < 0)).sum()) / n > 0.25:
         score -= 10
     return score
 
@@ -348,7 +453,28 @@ def _pick_best(df: pd.DataFrame, candidates: list[str], scorer) -> Optional[str]
     return best
 
 
+# Fidelity exports share the same layout day to day, so the picked schema is
+# cached by column names plus a sample of the first column; repeat uploads
+# (and the /positions + /positions/debug pair) skip the scoring pass.
+_PICK_CACHE: dict[tuple, dict[str, Optional[str]]] = {}
+
+
 def _pick_columns_for_positions(df: pd.DataFrame) -> dict[str, Optional[str]]:
+    key = (
+        tuple(str(c) for c in df.columns),
+        tuple(df.iloc[:80, 0].astype(str).tolist()) if len(df.columns) else (),
+    )
+    hit = _PICK_CACHE.get(key)
+    if hit is not None:
+        return dict(hit)
+    picked = _pick_columns_for_positions_uncached(df)
+    if len(_PICK_CACHE) >= 64:
+        _PICK_CACHE.clear()
+    _PICK_CACHE[key] = dict(picked)
+    return picked
+
+
+def _pick_columns_for_positions_uncached(df: pd.DataFrame) -> dict[str, Optional[str]]:
     def uniq(cols):
         out = []
         for c in cols:
@@ -368,6 +494,25 @@ def _pick_columns_for_positions(df: pd.DataFrame) -> dict[str, Optional[str]]:
     col_avg = _find_col_exact(df, "Average Cost Basis")
     col_cost = _find_col_exact(df, "Cost Basis Total")
 
+    # Standard Fidelity export: every header matched exactly, so skip the
+    # contains/scorer fallbacks entirely.
+    if all(
+        [col_symbol, col_desc, col_qty, col_price, col_value,
+         col_day, col_total, col_weight, col_avg, col_cost]
+    ):
+        return {
+            "symbol": col_symbol,
+            "desc": col_desc,
+            "qty": col_qty,
+            "price": col_price,
+            "value": col_value,
+            "cost": col_cost,
+            "avg": col_avg,
+            "day": col_day,
+            "total": col_total,
+            "weight": col_weight,
+        }
+
     if not col_symbol:
         sym_matches = uniq([_find_col_contains(df, ["symbol", "ticker"], reject_any=["cusip"])]) or list(df.columns)
         col_symbol = _pick_best(df, sym_matches, _col_score_symbol)
@@ -462,16 +607,6 @@ def _repair_shift_if_needed(df: pd.DataFrame, cols: dict[str, Optional[str]]) ->
     return cols
 
 
-def _pos_map(positions: list[dict[str, Any]]) -> dict[str, dict[str, Any]]:
-    out: dict[str, dict[str, Any]] = {}
-    for p in positions or []:
-        t = (p.get("ticker") or p.get("symbol") or "").strip().upper()
-        if not t:
-            continue
-        out[t] = p
-    return out
-
-
 async def _upsert_receipt_for_day(
     *,
     db,
@@ -483,14 +618,31 @@ async def _upsert_receipt_for_day(
     snapshots = db["snapshots"]
     receipts = db["receipts"]
 
+    # only the subfields the sold-diff below reads; the as_of hint keeps the
+    # newest-previous lookup on the index even as snapshots accumulate
     prev = await snapshots.find_one(
         {"as_of": {"$lt": as_of}},
         sort=[("as_of", -1)],
-        projection={"_id": 0, "as_of": 1, "positions": 1},
+        projection={
+            "_id": 0,
+            "as_of": 1,
+            "positions.ticker": 1,
+            "positions.symbol": 1,
+            "positions.quantity": 1,
+            "positions.last_price": 1,
+        },
+        hint=[("as_of", 1)],
     )
 
-    cur_map = _pos_map(positions)
-    prev_map = _pos_map((prev or {}).get("positions") or [])
+    # tickers are already normalized by _clean_symbol on both sides (current
+    # upload and stored snapshots), so a plain dict-comp beats _pos_map's
+    # re-strip/upper pass
+    cur_map = {p["ticker"]: p for p in positions if p.get("ticker")}
+    prev_map = {
+        (p.get("ticker") or p["symbol"]): p
+        for p in ((prev or {}).get("positions") or [])
+        if isinstance(p, dict) and (p.get("ticker") or p.get("symbol"))
+    }
 
     sold: list[dict[str, Any]] = []
     sold_value_est = 0.0
@@ -524,6 +676,8 @@ async def _upsert_receipt_for_day(
 
     sold.sort(key=lambda x: float(x.get("value_est") or 0.0), reverse=True)
 
+    now = utcnow()
+
     receipt_doc = {
         "date": as_of,
         "prev_date": (prev or {}).get("as_of"),
@@ -532,12 +686,12 @@ async def _upsert_receipt_for_day(
         "sold": sold,
         "sold_count": len(sold),
         "sold_value_est": float(sold_value_est),
-        "updated_at": utcnow(),
+        "updated_at": now,
     }
 
     await receipts.update_one(
         {"date": as_of},
-        {"$set": receipt_doc, "$setOnInsert": {"created_at": utcnow()}},
+        {"$set": receipt_doc, "$setOnInsert": {"created_at": now}},
         upsert=True,
     )
 
@@ -566,9 +720,7 @@ async def ingest_positions(
     require_admin(req)
 
     as_of = require_iso_date(as_of)
-    df, raw, filename = await _read_upload_table(file)
-
-    raw_sha256 = hashlib.sha256(raw).hexdigest()
+    df, raw, filename, raw_sha256 = await _read_upload_table(file)
     
     
     raw_size = len(raw)
@@ -595,48 +747,76 @@ async def ingest_positions(
     pending_amount = 0.0
     debug_pending_rows: list[dict[str, Any]] = []
 
-    for _, row in df.iterrows():
-        sym_raw = str(row.get(col_symbol, "")).strip()
-        desc_raw = str(row.get(col_desc, "")).strip() if col_desc else ""
-
-        sym_norm = sym_raw.strip().upper()
-
-        # ---- CAPTURE PENDING ACTIVITY (Fidelity row) ----
-        # Fidelity sometimes puts "Pending activity" in the symbol column OR "PENDING" as a symbol.
-        # Treat both as pending and DO NOT ingest as a position.
-        if sym_norm == "PENDING" or "pending" in sym_raw.lower():
-            raw_val = row.get(col_value) if col_value else None
-            pending_num = _to_float(raw_val) or 0.0
-            pending_amount += float(pending_num)
-
-            if debug:
-                debug_pending_rows.append(row.to_dict())
+    # Columnar path: clean each column once with pandas/map instead of
+    # running the helpers per cell inside df.iterrows().
+
+    # ---- CAPTURE PENDING ACTIVITY (Fidelity row) ----
+    # Fidelity sometimes puts "Pending activity" in the symbol column OR "PENDING"
+    # as a symbol. Treat both as pending and DO NOT ingest as a position.
+    sym_raw_s = df[col_symbol].astype(str).str.strip()
+    pending_mask = sym_raw_s.str.lower().str.contains("pending", regex=False)
+
+    if pending_mask.any():
+        if col_value:
+            for v in df.loc[pending_mask, col_value].tolist():
+                pending_amount += float(_to_float(v) or 0.0)
+        if debug:
+            debug_pending_rows = df.loc[pending_mask].to_dict(orient="records")
+    # ---- END PENDING CAPTURE ----
+
+    work = df.loc[~pending_mask]
+    sym_s = work[col_symbol].astype(str).map(_clean_symbol)
+    desc_s = (
+        work[col_desc].astype(str).str.strip()
+        if col_desc
+        else pd.Series("", index=work.index, dtype=str)
+    )
 
-            continue
-        # ---- END PENDING CAPTURE ----
+    keep = pd.Series(
+        [
+            (not _is_disclaimer_row(s, d)) and _looks_like_symbol(s)
+            for s, d in zip(sym_s.tolist(), desc_s.tolist())
+        ],
+        index=work.index,
+    )
 
-        sym = _clean_symbol(sym_raw)
+    sym_keep = sym_s[keep]
+    syms = sym_keep.tolist()
+    descs = desc_s[keep].tolist()
 
-        if _is_disclaimer_row(sym, desc_raw):
-            continue
-        if not _looks_like_symbol(sym):
-            continue
+    def _numeric_series(col: Optional[str]) -> Optional[pd.Series]:
+        if not col:
+            return None
+        return _to_float_vec(work.loc[keep, col])
 
-        qty = _to_float(row.get(col_qty)) or 0.0
-        price = _to_float(row.get(col_price)) if col_price else None
-        value = _to_float(row.get(col_value)) if col_value else None
-        avg = _to_float(row.get(col_avg)) if col_avg else None
-        day = _to_float(row.get(col_day)) if col_day else None
-        pnl = _to_float(row.get(col_total)) if col_total else None
-        weight = _to_float(row.get(col_weight)) if col_weight else None
-        cost = _to_float(row.get(col_cost)) if col_cost else None
+    def _as_list(x: Optional[pd.Series]) -> list[Optional[float]]:
+        if x is None:
+            return [None] * len(syms)
+        return [None if pd.isna(v) else float(v) for v in x.tolist()]
+
+    values_s = _numeric_series(col_value)
+    days_s = _numeric_series(col_day)
+
+    qtys = _as_list(_numeric_series(col_qty))
+    prices = _as_list(_numeric_series(col_price))
+    values = _as_list(values_s)
+    avgs = _as_list(_numeric_series(col_avg))
+    days = _as_list(days_s)
+    pnls = _as_list(_numeric_series(col_total))
+    weights = _as_list(_numeric_series(col_weight))
+    costs = _as_list(_numeric_series(col_cost))
+
+    for sym, desc_raw, qty, price, value, avg, day, pnl, weight, cost in zip(
+        syms, descs, qtys, prices, values, avgs, days, pnls, weights, costs
+    ):
+        qty = qty or 0.0
 
         pos: dict[str, Any] = {
             "ticker": sym,
             "symbol": sym,
             "name": desc_raw or "—",
             "quantity": float(qty),
-            "is_strict_ticker": bool(sym.endswith("**") or TICKER_RE.match(sym)),
+            "is_strict_ticker": bool(sym.endswith("**") or TICKER_RE.fullmatch(sym)),
             "qty": float(qty),
         }
 
@@ -677,22 +857,24 @@ async def ingest_positions(
     # IMPORTANT:
     # total_value should match Fidelity total (includes SPAXX** line)
     # pending is NOT a position line in our data, so add it here.
-    positions_total_value = float(sum(float(p.get("market_value") or p.get("value") or 0) for p in positions))
+    # Totals come straight from the cleaned columns as single reductions.
+    positions_total_value = float(values_s.fillna(0.0).sum()) if values_s is not None else 0.0
     total_value = float(positions_total_value + float(pending_amount))
 
-    non_cash_positions_value = float(
-        sum(
-            float(p.get("market_value") or p.get("value") or 0)
-            for p in positions
-            if not str(p.get("ticker", "")).endswith("**")
+    if values_s is not None:
+        non_cash_positions_value = float(
+            values_s[~sym_keep.str.endswith("**")].fillna(0.0).sum()
         )
-    )
+    else:
+        non_cash_positions_value = 0.0
 
-    todays_pnl_total = float(sum(float(p.get("todays_gain_loss") or p.get("day") or 0) for p in positions))
+    todays_pnl_total = float(days_s.fillna(0.0).sum()) if days_s is not None else 0.0
 
     db = get_db()
     snapshots = db["snapshots"]
 
+    now = utcnow()
+
     doc = {
         "as_of": as_of,
         "positions": positions,
@@ -706,16 +888,17 @@ async def ingest_positions(
             "filename": filename,
             "sha256": raw_sha256,
             "bytes": raw_size,
-            "ingested_at": utcnow(),
+            "ingested_at": now,
         },
-        "updated_at": utcnow(),
+        "updated_at": now,
     }
 
     await snapshots.update_one(
         {"as_of": as_of},
-        {"$set": doc, "$setOnInsert": {"created_at": utcnow()}},
+        {"$set": doc, "$setOnInsert": {"created_at": now}},
         upsert=True,
     )
+    invalidate_portfolio_cache()
 
     receipt = await _upsert_receipt_for_day(
         db=db,
@@ -751,7 +934,7 @@ async def debug_positions(
 ):
     require_admin(req)
 
-    df, raw, filename = await _read_upload_table(file)
+    df, _raw, filename, _sha256 = await _read_upload_table(file)
     picked = _pick_columns_for_positions(df)
     repaired = _repair_shift_if_needed(df, picked)
     return {
@@ -800,7 +983,7 @@ def _parse_run_date_cell(v: Any) -> Optional[str]:
         return s[:10]
 
     # M/D/YYYY
-    m = re.match(r"^(\d{1,2})/(\d{1,2})/(\d{4})$", s)
+    m = _MDY_RE.match(s)
     if m:
         mm, dd, yy = int(m.group(1)), int(m.group(2)), int(m.group(3))
         if 1 <= mm <= 12 and 1 <= dd <= 31:
@@ -829,7 +1012,7 @@ async def ingest_activity(
 ):
     require_admin(req)
 
-    df, raw, filename = await _read_upload_table(file)
+    df, _raw, filename, raw_sha256 = await _read_upload_table(file)
 
     # Try to locate columns (your screenshot headers)
     col_run_date = _find_col_contains(df, ["run date"]) or _find_col_exact(df, "Run Date") or _find_col_contains(df, ["date"])
@@ -863,14 +1046,9 @@ async def ingest_activity(
     db = get_db()
     col = db["activity_trades"]
 
-    raw_sha256 = hashlib.sha256(raw).hexdigest()
-
     # --- find newest trade date in file ---
-    dates_seen: list[str] = []
-    for _, rr in df.iterrows():
-        d = _parse_run_date_cell(rr.get(col_run_date))
-        if d:
-            dates_seen.append(d)
+    parsed_dates = df[col_run_date].map(_parse_run_date_cell)
+    dates_seen: list[str] = [d for d in parsed_dates.tolist() if d]
 
     if not dates_seen:
         return {"rows_written": 0, "rows_skipped": len(df), "rows_total_seen": len(df)}
@@ -883,41 +1061,62 @@ async def ingest_activity(
         return {"rows_written": 0, "rows_skipped": len(df), "rows_total_seen": len(df)}
 
     # --- only keep rows for that date ---
-    df = df[df[col_run_date].apply(lambda x: _parse_run_date_cell(x) == target_date)]
-
+    df = df[parsed_dates == target_date]
 
-    rows_total = 0
+    rows_total = len(df)
     written = 0
-    skipped = 0
-
-    for _, r in df.iterrows():
-        rows_total += 1
-
-        action = str(r.get(col_action, "")).strip()
-        side = _action_side(action)
-        if not side:
-            skipped += 1
-            continue
 
-        trade_date = _parse_run_date_cell(r.get(col_run_date))
-        if not trade_date:
-            skipped += 1
-            continue
-
-        sym = _clean_symbol(str(r.get(col_symbol, "")).strip())
-        if not sym or not _looks_like_symbol(sym):
-            skipped += 1
+    # Columnar pass: parse/clean every column once, then a single validity
+    # mask replaces the per-row skip checks (same rules, same counts).
+    actions = df[col_action].astype(str).str.strip()
+    sides = actions.map(_action_side)
+    syms = df[col_symbol].astype(str).str.strip().map(_clean_symbol)
+
+    def _float_col(col: Optional[str]) -> list[Optional[float]]:
+        if not col:
+            return [None] * rows_total
+        x = _to_float_vec(df[col])
+        return [None if pd.isna(v) else float(v) for v in x.tolist()]
+
+    descs = (
+        df[col_desc].astype(str).str.strip()
+        if col_desc
+        else pd.Series("", index=df.index, dtype=str)
+    ).tolist()
+    prices = _float_col(col_price)
+    qtys = _float_col(col_qty)
+    fees_list = _float_col(col_fees)
+    settles = (
+        df[col_settle].map(_parse_run_date_cell)
+        if col_settle
+        else pd.Series(None, index=df.index, dtype=object)
+    ).tolist()
+
+    valid = [
+        bool(side) and bool(sym) and _looks_like_symbol(sym) and qty is not None and qty != 0
+        for side, sym, qty in zip(sides.tolist(), syms.tolist(), qtys)
+    ]
+    skipped = rows_total - sum(valid)
+
+    # batch the upserts; one timestamp and one round-trip per 1000 rows
+    now = utcnow()
+    ops: list[UpdateOne] = []
+
+    async def _flush() -> None:
+        nonlocal written
+        if not ops:
+            return
+        res = await col.bulk_write(ops, ordered=False)
+        written += (res.upserted_count or 0) + (res.modified_count or 0)
+        ops.clear()
+
+    for ok, action, side, sym, desc, price, qty, fees, settle_date in zip(
+        valid, actions.tolist(), sides.tolist(), syms.tolist(), descs, prices, qtys, fees_list, settles
+    ):
+        if not ok:
             continue
 
-        desc = str(r.get(col_desc, "")).strip() if col_desc else ""
-        price = _to_float(r.get(col_price)) if col_price else None
-        qty = _to_float(r.get(col_qty)) if col_qty else None
-        fees = _to_float(r.get(col_fees)) if col_fees else None
-        settle_date = _parse_run_date_cell(r.get(col_settle)) if col_settle else None
-
-        if qty is None or qty == 0:
-            skipped += 1
-            continue
+        trade_date = target_date
 
         # Normalize qty sign: store as positive, side indicates direction
         qty_abs = abs(float(qty))
@@ -948,18 +1147,23 @@ async def ingest_activity(
                 "sha256": raw_sha256,
                 "action_raw": action,
             },
-            "updated_at": utcnow(),
+            "updated_at": now,
         }
 
-        res = await col.update_one(
-            {"trade_id": trade_id},
-            {"$set": doc, "$setOnInsert": {"created_at": utcnow()}},
-            upsert=True,
+        ops.append(
+            UpdateOne(
+                {"trade_id": trade_id},
+                {"$set": doc, "$setOnInsert": {"created_at": now}},
+                upsert=True,
+            )
         )
+        if len(ops) >= 1000:
+            await _flush()
 
-        # count a "write" if it inserted OR modified
-        if res.upserted_id is not None or (res.modified_count or 0) > 0:
-            written += 1
+    await _flush()
+
+    if written:
+        invalidate_latest_trade_date()
 
     return {
         "rows_written": written,
@@ -977,7 +1181,7 @@ async def ingest_performance(
 ):
     require_admin(req)
 
-    df, raw, filename = await _read_upload_table(file)
+    df, _raw, filename, _sha256 = await _read_upload_table(file)
 
     # Your current CSV headers (based on screenshot)
     col_date = _find_col_contains(df, ["date"]) or _find_col_exact(df, "Date")
@@ -999,19 +1203,13 @@ async def ingest_performance(
         if not s:
             return None
 
-        # Skip non-date rows like "TRANSFER"
-        if not any(ch.isdigit() for ch in s):
-            return None
-
         # Already ISO
         if ISO_DATE_RE.match(s[:10]):
             return s[:10]
 
-        # Excel-ish "Thursday 9/18/2025" or "9/18/2025"
-        parts = s.split()
-        candidate = parts[-1] if parts else s
-
-        m = re.match(r"^(\d{1,2})/(\d{1,2})/(\d{4})$", candidate)
+        # Excel-ish "Thursday 9/18/2025" or "9/18/2025"; the anchored search
+        # also rejects non-date rows like "TRANSFER" without a digit scan
+        m = _MDY_TAIL_RE.search(s)
         if not m:
             return None
         mm, dd, yy = int(m.group(1)), int(m.group(2)), int(m.group(3))
@@ -1019,61 +1217,64 @@ async def ingest_performance(
             return None
         return f"{yy:04d}-{mm:02d}-{dd:02d}"
 
-    def _clamp_ret(x: Optional[float]) -> Optional[float]:
-        """
-        Returns are DECIMALS in your file:
-          0.0197 = +1.97%
-         -0.0064 = -0.64%
-
-        We just clamp insane values so one bad row doesn't blow up the chart.
-        """
-        if x is None:
-            return None
-        v = float(x)
-
-        # If someone accidentally pastes 1.97 (meaning 197%), that's probably wrong.
-        # Clamp, but keep generous bounds.
-        if v < -0.99:
-            v = -0.99
-        if v > 5.0:
-            v = 5.0
-
-        return v
-
     db = get_db()
     perf = db["performance_daily"]
 
-    # Build clean rows, sort by date so running totals are deterministic
-    rows: list[dict[str, Any]] = []
-    for _, r in df.iterrows():
-        d = _to_iso_date(str(r.get(col_date, "")).strip())
-        if not d:
-            continue
-
-        bal = _to_float(r.get(col_bal))
-        if bal is None:
-            continue
-
-        dc = _to_float(r.get(col_dollar_change)) if col_dollar_change else None
-        roth_ret = _clamp_ret(_to_float(r.get(col_roth_ret))) if col_roth_ret else None
-        voo_close = _to_float(r.get(col_voo_close)) if col_voo_close else None
-        qqq_close = _to_float(r.get(col_qqq_close)) if col_qqq_close else None
-
-        rows.append(
-            {
-                "date": d,
-                "balance": float(bal),
-                "dollar_change": float(dc) if dc is not None else None,
-                "roth_ret": roth_ret,          # decimal daily return
-                "voo_close": voo_close,        # price
-                "qqq_close": qqq_close,        # price
-            }
+    # Build clean rows column-wise: one map/_to_float_vec pass per column,
+    # then a single validity mask instead of per-row skip checks.
+    dates = df[col_date].astype(str).str.strip().map(_to_iso_date)
+
+    def _num(col: Optional[str]) -> Optional[pd.Series]:
+        return _to_float_vec(df[col]) if col else None
+
+    bals = _num(col_bal)
+    mask = dates.notna() & bals.notna()
+
+    dcs = _num(col_dollar_change)
+    roths = _num(col_roth_ret)
+    if roths is not None:
+        # Returns are DECIMALS in the file (0.0197 = +1.97%); clamp insane
+        # values (someone pasting 1.97 for 197%) so one bad row doesn't blow
+        # up the chart, with generous bounds.
+        roths = roths.clip(-0.99, 5.0)
+    voos = _num(col_voo_close)
+    qqqs = _num(col_qqq_close)
+
+    # sort by date so running totals are deterministic; done at the Series
+    # level (stable mergesort, ties keep file order) so the rows come out
+    # ordered instead of re-sorting the dict list in Python afterwards
+    order = dates[mask].sort_values(kind="mergesort").index
+    n_valid = len(order)
+
+    def _vals(x: Optional[pd.Series]) -> list[Optional[float]]:
+        if x is None:
+            return [None] * n_valid
+        return [None if pd.isna(v) else float(v) for v in x.loc[order].tolist()]
+
+    rows: list[dict[str, Any]] = [
+        {
+            "date": d,
+            "balance": bal,
+            "dollar_change": dc,
+            "roth_ret": roth_ret,          # decimal daily return
+            "voo_close": voo_close,        # price
+            "qqq_close": qqq_close,        # price
+        }
+        for d, bal, dc, roth_ret, voo_close, qqq_close in zip(
+            dates.loc[order].tolist(),
+            [float(v) for v in bals.loc[order].tolist()],
+            _vals(dcs),
+            _vals(roths),
+            _vals(voos),
+            _vals(qqqs),
         )
-
-
-    rows.sort(key=lambda x: x["date"])
+    ]
 
     written = 0
+    now = utcnow()
+
+    # one round-trip per 1000 days instead of one per day
+    ops: list[UpdateOne] = []
 
     # Running totals you asked for (simple sum of daily % points)
     roth_running_pct = 0.0
@@ -1084,7 +1285,7 @@ async def ingest_performance(
         update_set: dict[str, Any] = {
             "date": row["date"],
             "balance": float(row["balance"]),
-            "updated_at": utcnow(),
+            "updated_at": now,
             "source_file": filename,
         }
 
@@ -1104,12 +1305,19 @@ async def ingest_performance(
         if row.get("qqq_close") is not None:
             update_set["qqq_close"] = float(row["qqq_close"])
 
-        await perf.update_one(
-            {"date": row["date"]},
-            {"$set": update_set, "$setOnInsert": {"created_at": utcnow()}},
-            upsert=True,
+        ops.append(
+            UpdateOne(
+                {"date": row["date"]},
+                {"$set": update_set, "$setOnInsert": {"created_at": now}},
+                upsert=True,
+            )
         )
         written += 1
+        if len(ops) >= 1000:
+            await perf.bulk_write(ops, ordered=False)
+            ops.clear()
 
+    if ops:
+        await perf.bulk_write(ops, ordered=False)
 
     return {"rows_written": written}
@@ -9,7 +9,6 @@ from bson import ObjectId
 
 from core.db import get_db
 from core.security import require_access_payload
-from fastapi import APIRouter, Request, HTTPException, Query
 
 router = APIRouter(prefix="/api/newsletter", tags=["Newsletter"])
 admin_router = APIRouter(prefix="/api/admin/newsletter", tags=["Admin Newsletter"])
@@ -85,19 +84,15 @@ async def list_posts(
     if kind:
         q["kind"] = kind
 
-    docs = await col.find(q).sort("created_at", -1).limit(limit).to_list(limit)
+    # project down to the list fields so content_md never leaves the server
+    docs = await (
+        col.find(q, {"_id": 0, "title": 1, "slug": 1, "kind": 1, "created_at": 1})
+        .sort("created_at", -1)
+        .limit(limit)
+        .to_list(limit)
+    )
 
-    return {
-        "items": [
-            {
-                "title": d["title"],
-                "slug": d["slug"],
-                "kind": d["kind"],
-                "created_at": d["created_at"],
-            }
-            for d in docs
-        ]
-    }
+    return {"items": docs}
 
 # ---------- PUBLIC READ ----------
 @admin_router.delete("/posts/{slug}")
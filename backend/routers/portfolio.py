@@ -3,12 +3,14 @@ from __future__ import annotations
 
 import os
 import asyncio
-import requests
+import httpx
 from datetime import datetime, timezone, timedelta
 from typing import Any, List, Optional, Dict, Tuple
 
+from cachetools import TTLCache
 from fastapi import APIRouter, HTTPException, Query
 from pydantic import BaseModel
+from pymongo import UpdateOne
 
 from core.db import get_db
 
@@ -327,15 +329,132 @@ def _snapshot_net_value(doc: dict) -> float:
     return float(total)
 
 
-async def _latest_snapshot_doc() -> dict:
-    db = get_db()
-    col = db["snapshots"]
-    doc = await col.find_one({}, sort=[("as_of", -1)], projection={"_id": 0})
+# The latest snapshot and the live-price map only change on ingest or a
+# price refresh, but every dashboard/summary/positions poll re-read them.
+# Short TTL cache guarded by a lock so concurrent requests share one Mongo
+# read; writers call invalidate_portfolio_cache() (same arrangement as
+# invalidate_latest_trade_date in routers/activity.py).
+_READ_CACHE: TTLCache = TTLCache(maxsize=8, ttl=30)
+_READ_CACHE_LOCK = asyncio.Lock()
+
+
+def invalidate_portfolio_cache() -> None:
+    _READ_CACHE.clear()
+
+
+async def _latest_snapshot_doc(projection: Optional[dict] = None) -> dict:
+    """
+    Latest snapshot, optionally narrowed to a projection so callers that only
+    need a few fields skip decoding the full positions array. Cached per
+    projection shape.
+    """
+    key = ("snap", tuple(sorted(projection))) if projection else ("snap",)
+    async with _READ_CACHE_LOCK:
+        doc = _READ_CACHE.get(key)
+        if doc is None:
+            proj = {"_id": 0}
+            if projection:
+                proj.update(projection)
+            db = get_db()
+            doc = await db["snapshots"].find_one({}, sort=[("as_of", -1)], projection=proj)
+            if doc:
+                _READ_CACHE[key] = doc
     if not doc:
         raise HTTPException(status_code=404, detail="No snapshots found")
     return doc
 
 
+# Aggregation-side mirrors of _positions_list / _position_value /
+# _extract_pending_amount, so a snapshot's net value can be reduced on the
+# server without shipping its positions array over the wire.
+_AGG_POSITIONS = {
+    "$cond": [
+        {"$isArray": "$positions"},
+        "$positions",
+        {"$cond": [{"$isArray": "$data"}, "$data", []]},
+    ]
+}
+
+# same preference order as _position_value; $convert matches _coerce_float
+# (numeric strings parse, anything else becomes 0.0)
+_AGG_POS_VALUE = {
+    "$convert": {
+        "input": {
+            "$ifNull": [
+                "$$p.market_value",
+                {"$ifNull": ["$$p.value", {"$ifNull": ["$$p.current_value", "$$p.currentValue"]}]},
+            ]
+        },
+        "to": "double",
+        "onError": 0.0,
+        "onNull": 0.0,
+    }
+}
+
+_AGG_PENDING = {
+    "$cond": [
+        {"$isNumber": "$pending_amount"},
+        "$pending_amount",
+        {
+            "$sum": {
+                "$map": {
+                    "input": {
+                        "$filter": {
+                            "input": _AGG_POSITIONS,
+                            "as": "p",
+                            "cond": {
+                                "$regexMatch": {
+                                    "input": {
+                                        "$toLower": {
+                                            "$toString": {
+                                                "$ifNull": [
+                                                    "$$p.description",
+                                                    {"$ifNull": ["$$p.desc", {"$ifNull": ["$$p.name", ""]}]},
+                                                ]
+                                            }
+                                        }
+                                    },
+                                    "regex": "pending",
+                                }
+                            },
+                        }
+                    },
+                    "as": "p",
+                    "in": _AGG_POS_VALUE,
+                }
+            }
+        },
+    ]
+}
+
+
+async def _snapshot_net_value_before(as_of: str) -> Optional[float]:
+    """
+    _snapshot_net_value of the newest snapshot strictly before as_of,
+    computed server-side. Returns None when there is no earlier snapshot.
+    """
+    db = get_db()
+    rows = await db["snapshots"].aggregate(
+        [
+            {"$match": {"as_of": {"$lt": as_of}}},
+            {"$sort": {"as_of": -1}},
+            {"$limit": 1},
+            {
+                "$project": {
+                    "_id": 0,
+                    "positions_total": {"$sum": {"$map": {"input": _AGG_POSITIONS, "as": "p", "in": _AGG_POS_VALUE}}},
+                    "pending": _AGG_PENDING,
+                }
+            },
+        ]
+    ).to_list(length=1)
+
+    if not rows:
+        return None
+    r = rows[0]
+    return float(_coerce_float(r.get("positions_total")) + _coerce_float(r.get("pending")))
+
+
 async def _snapshot_doc_for(as_of: str) -> dict:
     db = get_db()
     col = db["snapshots"]
@@ -345,9 +464,34 @@ async def _snapshot_doc_for(as_of: str) -> dict:
     return doc
 
 
-def _requests_get_json(url: str, params: dict, timeout: int = 15) -> Tuple[int, dict, str]:
+# One keep-alive client for all Polygon calls (same shape as routers/history.py):
+# created lazily so importing the module doesn't require a running event loop,
+# closed on app shutdown. Replaces requests.get inside asyncio.to_thread, so
+# calls reuse pooled TLS connections instead of paying a thread dispatch plus
+# a fresh handshake each time.
+_HTTP_CLIENT: Optional[httpx.AsyncClient] = None
+
+
+def _get_http_client() -> httpx.AsyncClient:
+    global _HTTP_CLIENT
+    if _HTTP_CLIENT is None:
+        _HTTP_CLIENT = httpx.AsyncClient(
+            timeout=15.0,
+            limits=httpx.Limits(max_keepalive_connections=32),
+        )
+    return _HTTP_CLIENT
+
+
+async def close_http_client() -> None:
+    global _HTTP_CLIENT
+    if _HTTP_CLIENT is not None:
+        await _HTTP_CLIENT.aclose()
+        _HTTP_CLIENT = None
+
+
+async def _http_get_json(url: str, params: dict, timeout: float = 15.0) -> Tuple[int, dict, str]:
     try:
-        r = requests.get(url, params=params, timeout=timeout)
+        r = await _get_http_client().get(url, params=params, timeout=timeout)
         status = r.status_code
         text_preview = (r.text or "")[:400]
         try:
@@ -362,7 +506,7 @@ def _requests_get_json(url: str, params: dict, timeout: int = 15) -> Tuple[int,
 async def _polygon_last_trade_price(ticker: str, api_key: str) -> Optional[float]:
     url = f"https://api.polygon.io/v2/last/trade/{ticker}"
     params = {"apiKey": api_key}
-    status, j, _ = await asyncio.to_thread(_requests_get_json, url, params, 15)
+    status, j, _ = await _http_get_json(url, params, 15.0)
     if status == 404:
         return None
     last = j.get("last") or {}
@@ -373,7 +517,7 @@ async def _polygon_last_trade_price(ticker: str, api_key: str) -> Optional[float
 async def _polygon_prev_close(ticker: str, api_key: str) -> Optional[float]:
     url = f"https://api.polygon.io/v2/aggs/ticker/{ticker}/prev"
     params = {"adjusted": "true", "apiKey": api_key}
-    status, j, _ = await asyncio.to_thread(_requests_get_json, url, params, 15)
+    status, j, _ = await _http_get_json(url, params, 15.0)
     if status == 404:
         return None
     results = j.get("results") or []
@@ -390,6 +534,44 @@ async def _get_any_price(ticker: str, api_key: str) -> Optional[float]:
     return await _polygon_prev_close(ticker, api_key)
 
 
+async def _polygon_snapshot_bulk(
+    tickers: List[str],
+    api_key: str,
+    errors: Optional[list] = None,
+) -> Dict[str, float]:
+    """
+    Price many tickers in a few HTTP calls via the market snapshot endpoint
+    (~250 symbols per request) instead of up to two round-trips per ticker.
+    Prefers lastTrade.p, falls back to prevDay.c — the same order
+    _get_any_price used. Tickers absent from the response are simply not in
+    the returned map.
+    """
+    url = "https://api.polygon.io/v2/snapshot/locale/us/markets/stocks/tickers"
+    out: Dict[str, float] = {}
+
+    for i in range(0, len(tickers), 250):
+        chunk = tickers[i : i + 250]
+        params = {"tickers": ",".join(chunk), "apiKey": api_key}
+        status, j, preview = await _http_get_json(url, params, 15.0)
+
+        if status >= 400:
+            if errors is not None:
+                errors.append(f"snapshot[{i // 250}]:{status}")
+            continue
+
+        for entry in j.get("tickers") or []:
+            t = str(entry.get("ticker") or "").upper().strip()
+            if not t:
+                continue
+            p = (entry.get("lastTrade") or {}).get("p")
+            if not isinstance(p, (int, float)) or not p:
+                p = (entry.get("prevDay") or {}).get("c")
+            if isinstance(p, (int, float)) and p:
+                out[t] = float(p)
+
+    return out
+
+
 async def _latest_prices_timestamp() -> Optional[datetime]:
     db = get_db()
     meta = db["prices_meta"]
@@ -398,7 +580,15 @@ async def _latest_prices_timestamp() -> Optional[datetime]:
 
 
 async def _latest_snapshot_tickers(limit: int = 2000) -> List[str]:
-    doc = await _latest_snapshot_doc()
+    doc = await _latest_snapshot_doc(
+        projection={
+            "as_of": 1,
+            "positions.ticker": 1,
+            "positions.symbol": 1,
+            "data.ticker": 1,
+            "data.symbol": 1,
+        }
+    )
     tickers: list[str] = []
     for p in _positions_list(doc):
         if not isinstance(p, dict):
@@ -471,23 +661,20 @@ async def ensure_prices_fresh(
     missing: list[str] = []
     errors: list[str] = []
 
-    sem = asyncio.Semaphore(REFRESH_CONCURRENCY)
-
-    async def fetch_one(t: str):
-        nonlocal updated
-        async with sem:
-            try:
-                price = await _get_any_price(t, api_key)
-            except Exception as e:
-                errors.append(f"{t}:{type(e).__name__}")
-                return
+    # One snapshot call per 250 tickers instead of a gather of per-ticker
+    # coroutines throttled to REFRESH_CONCURRENCY (each up to 2 HTTP calls).
+    prices = await _polygon_snapshot_bulk(need, api_key, errors=errors)
 
-            if price is None:
-                missing.append(t)
-                return
+    now2 = utcnow()
+    ops: list[UpdateOne] = []
+    for t in need:
+        price = prices.get(t)
+        if price is None:
+            missing.append(t)
+            continue
 
-            now2 = utcnow()
-            await prices_col.update_one(
+        ops.append(
+            UpdateOne(
                 {"ticker": t},
                 {
                     "$set": {"ticker": t, "price": float(price), "as_of": now2, "source": "polygon"},
@@ -495,9 +682,13 @@ async def ensure_prices_fresh(
                 },
                 upsert=True,
             )
-            updated += 1
+        )
+        updated += 1
 
-    await asyncio.gather(*(fetch_one(t) for t in need))
+    # one wire message instead of one round-trip per ticker
+    if ops:
+        await prices_col.bulk_write(ops, ordered=False)
+        invalidate_portfolio_cache()
 
     await meta_col.update_one(
         {"_id": "latest"},
@@ -517,19 +708,38 @@ async def ensure_prices_fresh(
     }
 
 
-async def _prices_map() -> Dict[str, dict]:
-    db = get_db()
-    col = db["prices_latest"]
-    cur = col.find({}, {"_id": 0, "ticker": 1, "price": 1, "as_of": 1}).sort("as_of", -1).limit(5000)
-    rows = await cur.to_list(length=5000)
+async def _prices_map(tickers: List[str]) -> Dict[str, dict]:
+    """
+    {TICKER -> {price, as_of}} for just the requested tickers. The unique
+    {ticker: 1} index (created at startup) guarantees one doc per ticker, so
+    no sort/dedupe pass is needed — unlike the old full-collection scan.
+    """
+    wanted = sorted({str(t or "").upper().strip() for t in tickers if str(t or "").strip()})
+    if not wanted:
+        return {}
+
+    key = ("prices", tuple(wanted))
+    async with _READ_CACHE_LOCK:
+        cached = _READ_CACHE.get(key)
+        if cached is not None:
+            return cached
+
+        db = get_db()
+        col = db["prices_latest"]
+        rows = await col.find(
+            {"ticker": {"$in": wanted}},
+            {"_id": 0, "ticker": 1, "price": 1, "as_of": 1},
+        ).to_list(length=len(wanted))
+
+        out: dict[str, dict] = {}
+        for r in rows:
+            t = str(r.get("ticker") or "").upper().strip()
+            p = r.get("price")
+            if not t or not isinstance(p, (int, float)):
+                continue
+            out[t] = {"price": float(p), "as_of": _as_aware_utc(r.get("as_of"))}
 
-    out: dict[str, dict] = {}
-    for r in rows:
-        t = str(r.get("ticker") or "").upper().strip()
-        p = r.get("price")
-        if not t or not isinstance(p, (int, float)) or t in out:
-            continue
-        out[t] = {"price": float(p), "as_of": _as_aware_utc(r.get("as_of"))}
+        _READ_CACHE[key] = out
     return out
 
 
@@ -709,25 +919,41 @@ async def get_latest_positions(
 async def dashboard_latest(
     refresh_max_age_sec: int = Query(REFRESH_EVERY_SEC, ge=30, le=86400),
 ):
-    db = get_db()
-    snap_col = db["snapshots"]
-
-    doc = await _latest_snapshot_doc()
+    # value + pending-detection fields only; cost/avg/day-change stay behind
+    doc = await _latest_snapshot_doc(
+        projection={
+            "as_of": 1,
+            "pending_amount": 1,
+            "positions.ticker": 1,
+            "positions.symbol": 1,
+            "positions.market_value": 1,
+            "positions.value": 1,
+            "positions.current_value": 1,
+            "positions.currentValue": 1,
+            "positions.description": 1,
+            "positions.desc": 1,
+            "positions.name": 1,
+            "data.ticker": 1,
+            "data.symbol": 1,
+            "data.market_value": 1,
+            "data.value": 1,
+            "data.current_value": 1,
+            "data.currentValue": 1,
+            "data.description": 1,
+            "data.desc": 1,
+            "data.name": 1,
+        }
+    )
     as_of = str(doc.get("as_of", ""))[:10]
 
     pending_amount = _extract_pending_amount(doc)
 
-    last_two = (
-        await snap_col.find({}, {"_id": 0})
-        .sort("as_of", -1)
-        .limit(2)
-        .to_list(length=2)
-    )
-    today_doc = last_two[0] if last_two else doc
-    prev_doc = last_two[1] if len(last_two) > 1 else None
-
-    today_total = _snapshot_net_value(today_doc)
-    prev_total = _snapshot_net_value(prev_doc) if prev_doc else today_total
+    # today's doc is the (cached) latest snapshot; the previous day's net
+    # value is reduced server-side so its positions array never leaves Mongo
+    today_total = _snapshot_net_value(doc)
+    prev_total = await _snapshot_net_value_before(str(doc.get("as_of", "")))
+    if prev_total is None:
+        prev_total = today_total
 
     todays_pnl_total = float(today_total - prev_total)
 
@@ -766,7 +992,7 @@ async def positions_for_date(as_of: str = Query(..., pattern=r"^\d{4}-\d{2}-\d{2
 
 @router.get("/api/latest")
 async def legacy_latest():
-    doc = await _latest_snapshot_doc()
+    doc = await _latest_snapshot_doc(projection={"as_of": 1})
     return {"snapshot_as_of": str(doc.get("as_of", ""))[:10]}
 
 
@@ -784,7 +1010,9 @@ async def legacy_portfolio_summary(
     pl_pct = (pl_abs / total_value) if total_value else 0.0
     invested_pct = (invested / total_value) if total_value else 0.0
 
-    doc = await _latest_snapshot_doc()
+    doc = await _latest_snapshot_doc(
+        projection={"as_of": 1, "positions.cost_value": 1, "data.cost_value": 1}
+    )
     cost_value = 0.0
     for p in _positions_list(doc):
         if isinstance(p, dict):
@@ -988,7 +1216,7 @@ async def benchmark_price_series(
     url = f"https://api.polygon.io/v2/aggs/ticker/{sym}/range/1/day/{start.date()}/{end.date()}"
     params = {"adjusted": "true", "sort": "asc", "limit": 5000, "apiKey": api_key}
 
-    status, j, preview = await asyncio.to_thread(_requests_get_json, url, params, 20)
+    status, j, preview = await _http_get_json(url, params, 20.0)
 
     if status == 404:
         raise HTTPException(status_code=404, detail=f"Symbol not found: {sym}")